@@ -233,14 +233,8 @@ def search():
     per_page = app.config.get('POSTS_PER_PAGE', 10)
     
     if keyword:
-        # 搜索文章
-        search_term = f"%{keyword}%"
-        articles = Article.query.filter_by(is_published=True)\
-            .filter(
-                Article.title.like(search_term) |
-                Article.content.like(search_term)
-            )\
-            .order_by(Article.created_at.desc())\
+        # 搜索文章 (全文索引)
+        articles = QueryHelper.search_query(keyword)\
             .paginate(page=page, per_page=per_page, error_out=False)
     else:
         articles = None
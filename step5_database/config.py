@@ -17,10 +17,8 @@ class Config:
     # 数据库配置
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_RECORD_QUERIES = True
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-    }
+    DATABASE_ENGINE_PROFILE = 'development'  # 引擎配置档 (见 engine_profile.py)
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # 显式的引擎参数，覆盖配置档中的同名参数
     
     # 文件上传配置
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
@@ -77,6 +75,7 @@ class TestingConfig(Config):
     
     # 内存数据库 (测试环境)
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
+    DATABASE_ENGINE_PROFILE = 'testing'
     
     # 禁用CSRF保护 (测试环境)
     WTF_CSRF_ENABLED = False
@@ -92,6 +91,7 @@ class ProductionConfig(Config):
     # 生产数据库 (PostgreSQL推荐)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(os.path.dirname(__file__), 'instance', 'blog.db')
+    DATABASE_ENGINE_PROFILE = 'production'
     
     # 生产环境不显示SQL
     SQLALCHEMY_ECHO = False
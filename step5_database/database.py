@@ -8,9 +8,111 @@ import os
 import json
 from datetime import datetime
 from flask import Flask
+from sqlalchemy import column, event, func, literal_column, table, text
+from sqlalchemy.orm import defer
 from models import db, User, Article, Tag, Comment, init_db
 from config import get_config
 
+class SearchIndex:
+    """
+    文章全文索引 (SQLite FTS5)
+    
+    使用外部内容表，由触发器与 articles 表保持同步；
+    trigram分词器可以像 LIKE '%kw%' 一样匹配中文子串
+    """
+    
+    TABLE = 'articles_fts'
+    MIN_TERM_LENGTH = 3
+    
+    DDL = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+            title, summary, content,
+            content='articles', content_rowid='id',
+            tokenize='trigram'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_ai AFTER INSERT ON articles BEGIN
+            INSERT INTO articles_fts(rowid, title, summary, content)
+            VALUES (new.id, new.title, new.summary, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_ad AFTER DELETE ON articles BEGIN
+            INSERT INTO articles_fts(articles_fts, rowid, title, summary, content)
+            VALUES ('delete', old.id, old.title, old.summary, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS articles_fts_au AFTER UPDATE OF title, summary, content ON articles BEGIN
+            INSERT INTO articles_fts(articles_fts, rowid, title, summary, content)
+            VALUES ('delete', old.id, old.title, old.summary, old.content);
+            INSERT INTO articles_fts(rowid, title, summary, content)
+            VALUES (new.id, new.title, new.summary, new.content);
+        END
+        """
+    ]
+    
+    _ready = set()
+    
+    @classmethod
+    def create(cls, connection):
+        """创建虚拟表和同步触发器 (幂等)"""
+        for statement in cls.DDL:
+            connection.execute(text(statement))
+    
+    @classmethod
+    def rebuild(cls):
+        """根据 articles 表全量重建索引"""
+        if db.engine.dialect.name != 'sqlite':
+            return False
+        
+        with db.engine.begin() as connection:
+            cls.create(connection)
+            connection.execute(text("INSERT INTO articles_fts(articles_fts) VALUES('rebuild')"))
+        cls._ready.add(db.engine)
+        return True
+    
+    @classmethod
+    def ensure(cls):
+        """确保索引存在，旧数据库首次搜索时自动建立索引"""
+        engine = db.engine
+        if engine in cls._ready:
+            return True
+        if engine.dialect.name != 'sqlite':
+            return False
+        
+        try:
+            with engine.connect() as connection:
+                exists = connection.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'")
+                ).first()
+            if not exists:
+                cls.rebuild()
+            cls._ready.add(engine)
+            return True
+        except Exception:
+            # SQLite未编译FTS5或不支持trigram分词器
+            return False
+    
+    @classmethod
+    def match_query(cls, keyword):
+        """把关键词转换为MATCH表达式，包含少于3个字符的词时返回None"""
+        terms = keyword.split()
+        if not terms or any(len(term) < cls.MIN_TERM_LENGTH for term in terms):
+            return None
+        return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+@event.listens_for(Article.__table__, 'after_create')
+def _create_search_index(target, connection, **kwargs):
+    """创建 articles 表时同时创建全文索引"""
+    if connection.dialect.name == 'sqlite':
+        try:
+            SearchIndex.create(connection)
+        except Exception:
+            pass
+
 class DatabaseManager:
     """数据库管理器"""
     
@@ -66,6 +168,14 @@ class DatabaseManager:
             print(f"✅ 数据库备份完成: {backup_path}")
             return backup_path
     
+    def rebuild_search_index(self):
+        """重建文章全文索引"""
+        with self.app.app_context():
+            if SearchIndex.rebuild():
+                print("✅ 全文搜索索引重建完成")
+            else:
+                print("⚠️  当前数据库不支持FTS5，搜索将使用LIKE查询")
+    
     def get_statistics(self):
         """获取数据库统计信息"""
         with self.app.app_context():
@@ -106,15 +216,17 @@ class QueryHelper:
     
     @staticmethod
     def get_popular_articles(limit=10):
-        """获取热门文章"""
-        return Article.query.filter_by(is_published=True)\
+        """获取热门文章 (列表不需要正文，延迟加载 content)"""
+        return Article.query.options(defer(Article.content))\
+            .filter_by(is_published=True)\
             .order_by(Article.views.desc())\
             .limit(limit).all()
     
     @staticmethod
     def get_recent_articles(limit=10):
-        """获取最新文章"""
-        return Article.query.filter_by(is_published=True)\
+        """获取最新文章 (列表不需要正文，延迟加载 content)"""
+        return Article.query.options(defer(Article.content))\
+            .filter_by(is_published=True)\
             .order_by(Article.created_at.desc())\
             .limit(limit).all()
     
@@ -145,15 +257,34 @@ class QueryHelper:
         return query.all()
     
     @staticmethod
-    def search_articles(keyword, limit=None):
-        """搜索文章"""
+    def search_query(keyword):
+        """
+        构建搜索查询
+        
+        可以使用全文索引时按BM25相关度排序 (标题权重最高)，
+        否则回退到LIKE查询并按发布时间排序
+        """
+        query = Article.query.filter_by(is_published=True)
+        
+        match_query = SearchIndex.match_query(keyword)
+        if match_query and SearchIndex.ensure():
+            fts = table(SearchIndex.TABLE, column('rowid'))
+            fts_column = literal_column(SearchIndex.TABLE)
+            return query.join(fts, fts.c.rowid == Article.id)\
+                .filter(fts_column.op('MATCH')(match_query))\
+                .order_by(func.bm25(fts_column, 10.0, 5.0, 1.0), Article.created_at.desc())
+        
         search_term = f"%{keyword}%"
-        query = Article.query.filter_by(is_published=True)\
-            .filter(
+        return query.filter(
                 Article.title.like(search_term) |
                 Article.content.like(search_term)
             )\
             .order_by(Article.created_at.desc())
+    
+    @staticmethod
+    def search_articles(keyword, limit=None):
+        """搜索文章"""
+        query = QueryHelper.search_query(keyword)
         
         if limit:
             query = query.limit(limit)
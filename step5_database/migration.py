@@ -11,7 +11,7 @@ import json
 import argparse
 from datetime import datetime
 from database import create_app
-from models import db, User, Article, Tag, Comment
+from models import db, User, Article, Tag, Comment, tag_resolver
 
 class DataMigrator:
     """数据迁移器"""
@@ -157,15 +157,12 @@ class DataMigrator:
                     db.session.add(article)
                     db.session.flush()  # 获取文章ID
                     
-                    # 处理标签
+                    # 处理标签 (批量解析，缺失的标签批量创建)
                     if 'tags' in article_data:
-                        for tag_name in article_data['tags']:
-                            tag = Tag.query.filter_by(name=tag_name).first()
-                            if not tag:
-                                tag = Tag(name=tag_name)
-                                db.session.add(tag)
-                                self.stats['tags']['migrated'] += 1
-                            
+                        tags = tag_resolver.resolve(article_data['tags'])
+                        self.stats['tags']['migrated'] += tag_resolver.last_created
+                        
+                        for tag in tags:
                             if tag not in article.tags:
                                 article.tags.append(tag)
                                 tag.usage_count += 1
@@ -11,6 +11,7 @@ from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Foreign
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
+from engine_profile import init_database
 import hashlib
 import secrets
 import re
@@ -19,8 +20,8 @@ db = SQLAlchemy()
 
 # 数据库初始化函数
 def init_db(app):
-    """初始化数据库"""
-    db.init_app(app)
+    """初始化数据库 (按配置档设置连接池和SQLite PRAGMA)"""
+    init_database(app, db)
 
     with app.app_context():
         # 创建所有表
@@ -163,6 +164,91 @@ class Tag(db.Model):
     def __repr__(self):
         return f'<Tag {self.name}>'
 
+class TagResolver:
+    """
+    标签名称批量解析
+    
+    一次 IN 查询取出已有标签，缺失的标签用一条 INSERT ... ON CONFLICT DO NOTHING
+    批量创建 (并发创建同名标签时不会因唯一约束失败)，再一次查询取回。
+    进程内缓存 名称→ID，同一会话中已加载的标签直接从identity map取得，不再查询
+    """
+    
+    def __init__(self, max_cache_size=1000):
+        self.max_cache_size = max_cache_size
+        self.last_created = 0  # 最近一次 resolve 新建的标签数
+        self._ids = {}
+    
+    def resolve(self, names):
+        """
+        把标签名称列表解析为Tag对象 (不存在的自动创建)
+        
+        Args:
+            names: 标签名称列表
+        
+        Returns:
+            list: 与去重后的名称顺序一致的Tag列表
+        """
+        self.last_created = 0
+        names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+        if not names:
+            return []
+        
+        session = db.session
+        tags = {}
+        
+        # 解析过程中不触发autoflush，避免把构造中的文章提前写入
+        with session.no_autoflush:
+            for name in names:
+                tag_id = self._ids.get(name)
+                if tag_id is not None:
+                    tag = session.identity_map.get(session.identity_key(Tag, tag_id))
+                    if tag is not None and tag.name == name:
+                        tags[name] = tag
+            
+            missing = [name for name in names if name not in tags]
+            if missing:
+                tags.update(self._load(missing))
+            
+            missing = [name for name in names if name not in tags]
+            if missing:
+                self.last_created = self._insert(missing)
+                tags.update(self._load(missing))
+        
+        return [tags[name] for name in names if name in tags]
+    
+    def _load(self, names):
+        """一次IN查询加载标签"""
+        found = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+        if len(self._ids) + len(found) > self.max_cache_size:
+            self._ids.clear()
+        self._ids.update((name, tag.id) for name, tag in found.items())
+        return found
+    
+    @staticmethod
+    def _insert(names):
+        """批量插入缺失的标签，已被其他请求创建的标签会被忽略"""
+        table = Tag.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).on_conflict_do_nothing(index_elements=['name'])
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table).on_conflict_do_nothing(index_elements=['name'])
+        elif dialect == 'mysql':
+            stmt = table.insert().prefix_with('IGNORE')
+        else:
+            stmt = table.insert()
+        result = db.session.execute(stmt, [{'name': name} for name in names])
+        return max(result.rowcount, 0)
+    
+    def clear_cache(self):
+        """清空名称缓存"""
+        self._ids.clear()
+
+# 全局标签解析器
+tag_resolver = TagResolver()
+
 class Article(db.Model):
     """文章模型"""
     __tablename__ = 'articles'
@@ -193,14 +279,9 @@ class Article(db.Model):
         self.author_id = author_id
         self.slug = self._generate_slug()
         
-        # 添加标签
+        # 添加标签 (批量解析，不逐个查询)
         if tags:
-            for tag_name in tags:
-                tag = Tag.query.filter_by(name=tag_name).first()
-                if not tag:
-                    tag = Tag(name=tag_name)
-                    db.session.add(tag)
-                self.tags.append(tag)
+            self.tags = tag_resolver.resolve(tags)
     
     def _generate_slug(self):
         """生成URL友好的slug"""
@@ -233,10 +314,10 @@ class Article(db.Model):
     
     def add_tag(self, tag_name):
         """添加标签"""
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.session.add(tag)
+        tags = tag_resolver.resolve([tag_name])
+        if not tags:
+            return
+        tag = tags[0]
         if tag not in self.tags:
             self.tags.append(tag)
             tag.increment_usage()
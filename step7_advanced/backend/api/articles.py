@@ -6,7 +6,8 @@
 """
 
 import asyncio
-from flask import Blueprint, request, Response
+from datetime import datetime
+from flask import Blueprint, current_app, request, Response, stream_with_context
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from marshmallow import ValidationError
 from sqlalchemy import or_, desc, asc
@@ -15,23 +16,79 @@ from sqlalchemy import or_, desc, asc
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../step5_database'))
-from models import db, Article, User, Tag, Comment
+from models import db, Article, User, Tag, Comment, tag_resolver
 
 # 导入工具函数
 from utils.response import (
     success_response, error_response, validation_error_response,
-    not_found_response, paginated_response, forbidden_response
+    not_found_response, paginated_response, forbidden_response,
+    generate_etag, latest_modified, is_not_modified, not_modified_response, with_validators
 )
 from utils.validation import (
     ArticleCreateSchema, ArticleUpdateSchema, PaginationSchema, SearchSchema,
     validate_request_data, format_validation_errors
 )
-from middleware.auth import article_owner_required
+from utils.counter_buffer import counter_buffer
+from utils.pagination import CursorError, keyset_paginate
+from utils.cache import response_cache
+from utils.search import search_index
+from utils.export import ArticleExporter
+from utils.tasks import task_queue
+from utils.serializers import FieldSelectionError, article_serializer
+from middleware.auth import article_owner_required, get_request_resource, rate_limit_by_user
 
 # 创建蓝图
 articles_bp = Blueprint('articles', __name__)
 
+# 游标分页支持的排序字段 (必须是非空列)
+CURSOR_SORT_FIELDS = ('created_at', 'updated_at', 'views', 'likes')
+
+# 列表ETag用到的列 (见 article_list_validators)，按 ?fields= 裁剪查询列时也要加载
+VALIDATOR_COLUMNS = ('id', 'updated_at', 'likes', 'comment_count', 'is_published')
+
+def article_cache_tags(article_data):
+    """文章序列化数据对应的缓存标签 (?fields= 未选择作者或标签时不需要对应的标签)"""
+    tags = [f'article:{article_data["id"]}']
+    if article_data.get('author'):
+        tags.append(f'user:{article_data["author"]["id"]}')
+    tags.extend(f'tag:{tag["name"]}' for tag in article_data.get('tags', []))
+    return tags
+
+def article_version(article, fields=None):
+    """
+    文章在ETag中的版本信息
+
+    作者改名不会更新文章的 updated_at，输出中包含作者或标签时把用户名和标签ID也计入
+    (只读取查询时已预加载的关系)
+    """
+    version = [article.id, article.updated_at, article.likes, article.comment_count, article.is_published]
+    if fields is None or 'author' in fields:
+        version.append(article.author.username if article.author else None)
+    if fields is None or 'tags' in fields:
+        version.append(sorted(tag.id for tag in article.tags))
+    return tuple(version)
+
+def article_list_validators(pagination, fields=None):
+    """
+    根据当前页文章的版本信息生成列表的ETag和Last-Modified
+
+    只读取已加载的列值和关系，在序列化之前即可判断客户端缓存是否有效。
+    浏览量和点赞数还有未落库的缓冲增量，只能使用弱ETag (浏览量不计入，避免频繁失效)
+    """
+    etag = generate_etag(pagination.total, getattr(pagination, 'next_cursor', None), [
+        article_version(article, fields) for article in pagination.items
+    ])
+    return etag, latest_modified(article.updated_at for article in pagination.items)
+
+def article_list_cache_tags(payload, **kwargs):
+    """文章列表/搜索结果的缓存标签"""
+    tags = ['articles']
+    for article_data in payload.get('data') or []:
+        tags.extend(article_cache_tags(article_data))
+    return tags
+
 @articles_bp.route('', methods=['GET'])
+@response_cache.cached(tags=article_list_cache_tags)
 def get_articles():
     """
     获取文章列表
@@ -44,6 +101,8 @@ def get_articles():
         tag: 标签名称
         sort: 排序字段 (created_at, updated_at, views, likes)
         order: 排序方向 (asc, desc)
+        cursor: 游标分页 (首页传空值，之后传上一页返回的 next_cursor；此时忽略page且不返回总数)
+        fields: 逗号分隔的返回字段 (可选，如 id,title,author)
     
     Returns:
         JSON: 文章列表和分页信息
@@ -57,9 +116,18 @@ def get_articles():
             'page': args.get('page', 1),
             'per_page': args.get('per_page', 10)
         })
+        fields = article_serializer.select('list', args.get('fields'))
         
-        # 构建查询
-        query = Article.query
+        # 排序
+        sort_field = args.get('sort', 'created_at')
+        order = args.get('order', 'desc')
+        cursor_sort_field = sort_field if sort_field in CURSOR_SORT_FIELDS else 'created_at'
+        sort_column = getattr(Article, sort_field, Article.created_at)
+        
+        # 构建查询 (只加载选中字段用到的列，预加载用到的作者和标签)
+        query = Article.query.options(*article_serializer.query_options(
+            'list', fields, extra_columns=VALIDATOR_COLUMNS + (cursor_sort_field,)
+        ))
         
         # 过滤已发布文章
         published = args.get('published', 'true').lower() == 'true'
@@ -76,58 +144,51 @@ def get_articles():
         if tag:
             query = query.join(Article.tags).filter(Tag.name == tag)
         
-        # 排序
-        sort_field = args.get('sort', 'created_at')
-        order = args.get('order', 'desc')
-        
-        sort_column = getattr(Article, sort_field, Article.created_at)
-        if order == 'asc':
-            query = query.order_by(asc(sort_column))
+        if 'cursor' in args:
+            # 游标分页: WHERE (sort, id) < 游标位置，不使用OFFSET和COUNT
+            pagination = keyset_paginate(
+                query, Article,
+                cursor_sort_field,
+                'asc' if order == 'asc' else 'desc',
+                pagination_data['per_page'],
+                cursor=args.get('cursor')
+            )
         else:
-            query = query.order_by(desc(sort_column))
+            if order == 'asc':
+                query = query.order_by(asc(sort_column))
+            else:
+                query = query.order_by(desc(sort_column))
+            
+            # 分页查询
+            pagination = query.paginate(
+                page=pagination_data['page'],
+                per_page=pagination_data['per_page'],
+                error_out=False
+            )
         
-        # 分页查询
-        pagination = query.paginate(
-            page=pagination_data['page'],
-            per_page=pagination_data['per_page'],
-            error_out=False
-        )
+        # 内容未变化时直接返回304，跳过序列化
+        etag, last_modified = article_list_validators(pagination, fields)
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified, weak=True)
         
         # 序列化文章数据
-        articles_data = []
-        for article in pagination.items:
-            article_data = {
-                'id': article.id,
-                'title': article.title,
-                'summary': article.summary or article.content[:200] + '...',
-                'slug': article.slug,
-                'is_published': article.is_published,
-                'featured_image': article.featured_image,
-                'views': article.views,
-                'likes': article.likes,
-                'created_at': article.created_at.isoformat(),
-                'updated_at': article.updated_at.isoformat(),
-                'author': {
-                    'id': article.author.id,
-                    'username': article.author.username
-                },
-                'tags': [{'id': tag.id, 'name': tag.name} for tag in article.tags],
-                'comment_count': article.comment_count
-            }
-            articles_data.append(article_data)
+        articles_data = article_serializer.dump_many(pagination.items, 'list', fields)
         
-        return paginated_response(
+        return with_validators(paginated_response(
             data=articles_data,
             page=pagination.page,
             per_page=pagination.per_page,
             total=pagination.total,
-            message='获取文章列表成功'
-        )
+            message='获取文章列表成功',
+            next_cursor=getattr(pagination, 'next_cursor', None)
+        ), etag, last_modified, weak=True)
         
     except ValidationError as e:
         return validation_error_response(
             errors=format_validation_errors(e.messages)
         )
+    except (CursorError, FieldSelectionError) as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f'获取文章列表失败: {str(e)}')
 
@@ -139,14 +200,43 @@ def get_article(article_id):
     Path Parameters:
         article_id: 文章ID
     
+    Query Parameters:
+        fields: 逗号分隔的返回字段 (可选)
+    
     Returns:
         JSON: 文章详情
     """
     try:
-        article = Article.query.get(article_id)
+        fields = article_serializer.select('detail', request.args.get('fields'))
         
-        if not article:
-            return not_found_response('文章')
+        # 文章数据与当前用户无关，按文章缓存；浏览量在缓存之外实时累加。
+        # 缓存的是完整投影，?fields= 只在返回时裁剪，不参与缓存键
+        cache_key = response_cache.make_key('article', exclude=('fields',))
+        cached = response_cache.get(cache_key)
+        
+        if cached is not None:
+            article_data, etag, last_modified = cached
+        else:
+            # 查询之前记录标签版本，查询期间提交的修改不会被缓存掩盖
+            cache_versions = response_cache.snapshot([f'article:{article_id}', f'views:{article_id}'])
+            article = Article.query.options(
+                *article_serializer.query_options('detail')
+            ).filter(Article.id == article_id).first()
+            
+            if not article:
+                return not_found_response('文章')
+            
+            # 序列化完整的文章数据 (缓存后再按 ?fields= 取子集)
+            article_data = article_serializer.dump(article, 'detail')
+            # 浏览量每次请求都会变化，不参与ETag计算 (轮询验证不计为浏览)；
+            # 响应中的浏览量和点赞数包含缓冲增量，使用弱ETag
+            etag = generate_etag(article_version(article))
+            last_modified = article.updated_at
+            response_cache.set(
+                cache_key, (article_data, etag, last_modified),
+                tags=article_cache_tags(article_data) + [f'views:{article_id}'],
+                versions=cache_versions
+            )
         
         # 检查文章是否已发布 (除非是作者本人)
         current_user_id = None
@@ -157,44 +247,36 @@ def get_article(article_id):
         except:
             pass
         
-        if not article.is_published and article.author_id != current_user_id:
+        is_author = current_user_id is not None and str(current_user_id) == str(article_data['author']['id'])
+        if not article_data['is_published'] and not is_author:
             return not_found_response('文章')
         
-        # 增加浏览量 (如果不是作者本人)
-        if current_user_id != article.author_id:
-            article.add_view()
-            db.session.commit()
+        # 客户端缓存仍然有效时返回304
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified, weak=True)
         
-        # 序列化文章数据
-        article_data = {
-            'id': article.id,
-            'title': article.title,
-            'content': article.content,
-            'summary': article.summary,
-            'slug': article.slug,
-            'is_published': article.is_published,
-            'featured_image': article.featured_image,
-            'views': article.views,
-            'likes': article.likes,
-            'created_at': article.created_at.isoformat(),
-            'updated_at': article.updated_at.isoformat(),
-            'author': {
-                'id': article.author.id,
-                'username': article.author.username
-            },
-            'tags': [{'id': tag.id, 'name': tag.name} for tag in article.tags],
-            'comment_count': article.comment_count
-        }
+        # 增加浏览量 (如果不是作者本人，写入缓冲区定时批量落库)
+        pending_views, pending_likes = counter_buffer.pending(article_id)
+        if not is_author:
+            pending_views = counter_buffer.record_view(article_id)
         
-        return success_response(
-            data={'article': article_data},
-            message='获取文章详情成功'
+        article_data = dict(
+            article_data,
+            views=article_data['views'] + pending_views,
+            likes=article_data['likes'] + pending_likes
         )
         
+        return with_validators(success_response(
+            data={'article': article_serializer.restrict(article_data, fields)},
+            message='获取文章详情成功'
+        ), etag, last_modified, weak=True)
+        
+    except FieldSelectionError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f'获取文章详情失败: {str(e)}')
 
-# 异步任务示例
+# 异步任务示例 (由后台任务队列执行)
 async def send_notification(article_title):
     """模拟一个耗时的异步通知任务"""
     print(f"开始为文章 '{article_title}' 发送通知...")
@@ -245,40 +327,13 @@ def create_article():
         db.session.commit()
 
         # --- 异步任务演示 ---
-        # 在同步的Flask路由中运行一个异步函数
-        # 注意：asyncio.run()会阻塞当前线程直到任务完成。
-        # 在生产环境中，通常会使用任务队列（如Celery）来处理后台任务，以避免阻塞Web服务器。
-        # 这里的演示主要是为了展示async/await的语法和用法。
-        try:
-            asyncio.run(send_notification(article.title))
-        except RuntimeError:
-            # 如果当前线程已经有事件循环在运行，
-            # asyncio.run()会抛出RuntimeError。
-            # 此时可以使用更底层的API来运行。
-            loop = asyncio.get_event_loop()
-            loop.create_task(send_notification(article.title))
-
+        # 通知是耗时的副作用，提交给后台任务队列执行，请求立即返回。
+        # 队列在工作线程中运行 async 函数 (或在独立线程的事件循环中调度)，
+        # 失败时自动重试，应用退出时会等待队列排空。
+        task_queue.submit(send_notification, article.title)
         
         # 序列化文章数据
-        article_data = {
-            'id': article.id,
-            'title': article.title,
-            'content': article.content,
-            'summary': article.summary,
-            'slug': article.slug,
-            'is_published': article.is_published,
-            'featured_image': article.featured_image,
-            'views': article.views,
-            'likes': article.likes,
-            'created_at': article.created_at.isoformat(),
-            'updated_at': article.updated_at.isoformat(),
-            'author': {
-                'id': article.author.id,
-                'username': article.author.username
-            },
-            'tags': [{'id': tag.id, 'name': tag.name} for tag in article.tags],
-            'comment_count': 0
-        }
+        article_data = article_serializer.dump(article, 'detail')
         
         return success_response(
             data={'article': article_data},
@@ -317,7 +372,8 @@ def update_article(article_id):
         JSON: 更新后的文章信息
     """
     try:
-        article = Article.query.get(article_id)
+        # 复用权限检查时加载的文章
+        article = get_request_resource(Article, article_id)
         if not article:
             return not_found_response('文章')
 
@@ -336,42 +392,14 @@ def update_article(article_id):
         if 'featured_image' in data:
             article.featured_image = data['featured_image']
 
-        # 更新标签
+        # 更新标签 (一次批量解析，缺失的标签批量创建)
         if 'tags' in data:
-            # 清除现有标签
-            article.tags.clear()
-
-            # 添加新标签
-            tag_names = data['tags']
-            for tag_name in tag_names:
-                tag = Tag.query.filter_by(name=tag_name).first()
-                if not tag:
-                    tag = Tag(name=tag_name)
-                    db.session.add(tag)
-                article.tags.append(tag)
+            article.tags = tag_resolver.resolve(data['tags'])
 
         db.session.commit()
 
         # 序列化文章数据
-        article_data = {
-            'id': article.id,
-            'title': article.title,
-            'content': article.content,
-            'summary': article.summary,
-            'slug': article.slug,
-            'is_published': article.is_published,
-            'featured_image': article.featured_image,
-            'views': article.views,
-            'likes': article.likes,
-            'created_at': article.created_at.isoformat(),
-            'updated_at': article.updated_at.isoformat(),
-            'author': {
-                'id': article.author.id,
-                'username': article.author.username
-            },
-            'tags': [{'id': tag.id, 'name': tag.name} for tag in article.tags],
-            'comment_count': article.comment_count
-        }
+        article_data = article_serializer.dump(article, 'detail')
 
         return success_response(
             data={'article': article_data},
@@ -401,7 +429,7 @@ def delete_article(article_id):
         JSON: 删除结果
     """
     try:
-        article = Article.query.get(article_id)
+        article = get_request_resource(Article, article_id)
         if not article:
             return not_found_response('文章')
 
@@ -437,12 +465,11 @@ def like_article(article_id):
         if not article.is_published:
             return not_found_response('文章')
 
-        # 增加点赞数
-        article.add_like()
-        db.session.commit()
+        # 增加点赞数 (写入缓冲区定时批量落库)
+        likes = article.likes + counter_buffer.record_like(article.id)
 
         return success_response(
-            data={'likes': article.likes},
+            data={'likes': likes},
             message='点赞成功'
         )
 
@@ -450,6 +477,11 @@ def like_article(article_id):
         return error_response(f'点赞失败: {str(e)}')
 
 @articles_bp.route('/search', methods=['GET'])
+@rate_limit_by_user(
+    limit=lambda: current_app.config['SEARCH_RATELIMIT'],
+    anonymous_limit=lambda: current_app.config['SEARCH_RATELIMIT_ANONYMOUS']
+)
+@response_cache.cached(tags=article_list_cache_tags)
 def search_articles():
     """
     搜索文章
@@ -457,10 +489,11 @@ def search_articles():
     Query Parameters:
         q: 搜索关键词
         category: 分类 (可选)
-        sort: 排序字段 (默认: created_at)
+        sort: 排序字段 (默认: relevance，按BM25相关度)
         order: 排序方向 (默认: desc)
         page: 页码 (默认: 1)
         per_page: 每页数量 (默认: 10)
+        fields: 逗号分隔的返回字段 (可选)
 
     Returns:
         JSON: 搜索结果和分页信息
@@ -470,39 +503,53 @@ def search_articles():
         args = request.args.to_dict()
 
         # 验证搜索参数
-        search_data = validate_request_data(SearchSchema, args)
+        search_data = validate_request_data(SearchSchema, {
+            key: value for key, value in args.items()
+            if key in ('q', 'category', 'sort', 'order')
+        })
         pagination_data = validate_request_data(PaginationSchema, {
             'page': args.get('page', 1),
             'per_page': args.get('per_page', 10)
         })
+        fields = article_serializer.select('search', args.get('fields'))
 
-        # 构建搜索查询
-        query = Article.query.filter(Article.is_published == True)
-
-        # 关键词搜索
         keyword = search_data['q']
-        query = query.filter(
-            or_(
-                Article.title.contains(keyword),
-                Article.content.contains(keyword),
-                Article.summary.contains(keyword)
+        sort_field = search_data['sort']
+        order = search_data['order']
+
+        # 构建搜索查询 (只加载选中字段用到的列，预加载用到的作者和标签)
+        query = Article.query.options(*article_serializer.query_options(
+            'search', fields, extra_columns=VALIDATOR_COLUMNS
+        )).filter(Article.is_published == True)
+
+        # 关键词搜索 (优先使用全文索引，不可用时回退到LIKE)
+
+        match_query = search_index.build_match_query(keyword)
+        if match_query and search_index.ensure():
+            query = search_index.apply(query, match_query, order_by_rank=(sort_field == 'relevance'))
+        else:
+            match_query = None
+            query = query.filter(
+                or_(
+                    Article.title.contains(keyword),
+                    Article.content.contains(keyword),
+                    Article.summary.contains(keyword)
+                )
             )
-        )
 
         # 分类过滤
         category = search_data.get('category')
         if category:
             query = query.join(Article.tags).filter(Tag.name == category)
 
-        # 排序
-        sort_field = search_data['sort']
-        order = search_data['order']
-
-        sort_column = getattr(Article, sort_field, Article.created_at)
-        if order == 'asc':
-            query = query.order_by(asc(sort_column))
-        else:
-            query = query.order_by(desc(sort_column))
+        # 排序 (相关度排序已在全文匹配时添加，ID作为并列时的次序)
+        if sort_field != 'relevance' or not match_query:
+            sort_column = getattr(Article, sort_field, Article.created_at)
+            if order == 'asc':
+                query = query.order_by(asc(sort_column))
+            else:
+                query = query.order_by(desc(sort_column))
+        query = query.order_by(desc(Article.id))
 
         # 分页查询
         pagination = query.paginate(
@@ -511,63 +558,78 @@ def search_articles():
             error_out=False
         )
 
+        # 内容未变化时直接返回304，跳过高亮查询和序列化
+        etag, last_modified = article_list_validators(pagination, fields)
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified, weak=True)
+
+        # 标题高亮和正文片段 (一次查询)
+        highlights = {}
+        if match_query:
+            highlights = search_index.highlights(
+                match_query, [article.id for article in pagination.items]
+            )
+
         # 序列化搜索结果
-        articles_data = []
-        for article in pagination.items:
-            article_data = {
-                'id': article.id,
-                'title': article.title,
-                'summary': article.summary or article.content[:200] + '...',
-                'slug': article.slug,
-                'featured_image': article.featured_image,
-                'views': article.views,
-                'likes': article.likes,
-                'created_at': article.created_at.isoformat(),
-                'author': {
-                    'id': article.author.id,
-                    'username': article.author.username
-                },
-                'tags': [{'id': tag.id, 'name': tag.name} for tag in article.tags]
-            }
-            articles_data.append(article_data)
-
-        return paginated_response(
+        articles_data = article_serializer.dump_many(pagination.items, 'search', fields)
+        for article_data in articles_data:
+            if article_data['id'] in highlights:
+                article_data['highlight'] = highlights[article_data['id']]
+
+        return with_validators(paginated_response(
             data=articles_data,
             page=pagination.page,
             per_page=pagination.per_page,
             total=pagination.total,
             message=f'搜索到 {pagination.total} 篇文章'
-        )
+        ), etag, last_modified, weak=True)
 
     except ValidationError as e:
         return validation_error_response(
             errors=format_validation_errors(e.messages)
         )
+    except FieldSelectionError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f'搜索失败: {str(e)}')
 
 
 @articles_bp.route('/export', methods=['GET'])
 @jwt_required()
+@rate_limit_by_user(limit=lambda: current_app.config['EXPORT_RATELIMIT'])
 def export_articles():
     """
-    导出所有文章为CSV文件 (使用生成器)
+    流式导出文章 (使用生成器)
+
+    Query Parameters:
+        format: 导出格式 csv / ndjson (默认: csv)
+        gzip: 是否gzip压缩 (默认: false)
+        start: 创建时间起始日期，ISO格式 (可选，包含)
+        end: 创建时间截止日期，ISO格式 (可选，不包含)
+        published: 是否只导出已发布文章 (默认: false)
+
+    Returns:
+        Response: 分块传输的导出文件
     """
-    def generate_csv():
-        # CSV header
-        yield 'id,title,author,tags,views,likes,created_at\n'
-        
-        # 查询所有文章
-        articles = Article.query.order_by(Article.created_at.desc()).all()
-        
-        for article in articles:
-            tags = ';'.join([tag.name for tag in article.tags])
-            row = f'"{article.id}","{article.title}","{article.author.username}","{tags}",{article.views},{article.likes},"{article.created_at.isoformat()}"\n'
-            yield row
+    args = request.args
+    try:
+        start = datetime.fromisoformat(args['start']) if args.get('start') else None
+        end = datetime.fromisoformat(args['end']) if args.get('end') else None
+        exporter = ArticleExporter(
+            fmt=args.get('format', 'csv').lower(),
+            start=start,
+            end=end,
+            published_only=args.get('published', 'false').lower() == 'true'
+        )
+    except ValueError as e:
+        return error_response(f'导出参数错误: {str(e)}', status_code=400)
 
+    compress = args.get('gzip', 'false').lower() == 'true'
+    filename = exporter.filename(compress)
     headers = {
-        'Content-Disposition': 'attachment; filename="articles_export.csv"',
-        'Content-Type': 'text/csv; charset=utf-8'
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Content-Type': 'application/gzip' if compress else exporter.mimetype
     }
-    
-    return Response(generate_csv(), headers=headers)
+
+    # stream_with_context 让生成器在响应输出期间仍能访问数据库会话
+    return Response(stream_with_context(exporter.stream(compress)), headers=headers)
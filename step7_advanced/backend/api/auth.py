@@ -217,11 +217,12 @@ def logout():
     """
     try:
         # 获取当前令牌的JTI (JWT ID)
-        jti = get_jwt().get('jti')
+        claims = get_jwt()
+        jti = claims.get('jti')
         
-        # 将令牌添加到黑名单
+        # 将令牌添加到黑名单 (保留到令牌本身过期为止)
         if jti:
-            TokenBlacklist.add_token(jti)
+            TokenBlacklist.add_token(jti, claims.get('exp'))
         
         return success_response(message='登出成功')
         
@@ -5,10 +5,12 @@
 提供评论的CRUD操作和管理功能
 """
 
-from flask import Blueprint, request, jsonify
+import asyncio
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 from sqlalchemy import desc, asc, or_
+from sqlalchemy.orm import joinedload
 
 # 导入数据库模型
 from models import db, Comment, Article, User
@@ -16,13 +18,18 @@ from models import db, Comment, Article, User
 # 导入工具函数
 from utils.response import (
     success_response, error_response, validation_error_response,
-    not_found_response, paginated_response
+    not_found_response, paginated_response,
+    generate_etag, latest_modified, is_not_modified, not_modified_response, with_validators
 )
 from utils.validation import (
     validate_request_data, format_validation_errors,
-    CommentCreateSchema, CommentUpdateSchema, PaginationSchema
+    CommentCreateSchema, CommentUpdateSchema, CommentThreadSchema, PaginationSchema
 )
-from middleware.auth import owner_or_admin_required
+from utils.tasks import task_queue
+from utils.pagination import CursorError, keyset_paginate
+from utils.cache import response_cache
+from utils.comment_tree import load_comment_thread
+from middleware.auth import get_request_resource
 
 # 创建蓝图
 comments_bp = Blueprint('comments', __name__)
@@ -30,12 +37,13 @@ comments_bp = Blueprint('comments', __name__)
 def comment_owner_required(f):
     """评论所有者权限装饰器"""
     def decorated_function(comment_id, *args, **kwargs):
-        comment = Comment.query.get(comment_id)
+        comment = get_request_resource(Comment, comment_id)
         if not comment:
             return not_found_response('评论')
         
+        # JWT身份为字符串，作者ID为整数
         current_user_id = get_jwt_identity()
-        if comment.author_id != current_user_id:
+        if str(comment.author_id) != str(current_user_id):
             return error_response('无权限操作此评论', status_code=403)
         
         return f(comment_id, *args, **kwargs)
@@ -43,7 +51,77 @@ def comment_owner_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+async def send_comment_notification(article_title, author_id):
+    """模拟通知文章作者有新评论 (由后台任务队列执行)"""
+    print(f"开始通知作者(ID: {author_id}) 文章 '{article_title}' 有新评论...")
+    await asyncio.sleep(1)  # 模拟网络延迟
+    print(f"✅ 文章 '{article_title}' 的新评论通知发送完成。")
+
+def comment_version(comment):
+    """
+    评论在ETag中的版本信息
+
+    响应中还包含作者用户名和文章标题，改名不会更新评论的 updated_at，一并计入
+    """
+    return (
+        comment.id, comment.updated_at, comment.reply_count, comment.author.username,
+        comment.article.id, comment.article.title, comment.article.updated_at
+    )
+
+def comment_list_cache_tags(payload, **kwargs):
+    """评论列表的缓存标签"""
+    tags = ['comments']
+    data = payload.get('data')
+    if isinstance(data, list):
+        for comment_data in data:
+            tags.append(f'article:{comment_data["article"]["id"]}')
+            tags.append(f'user:{comment_data["author"]["id"]}')
+    return tags
+
+def comment_thread_response(article_id=None, root_id=None):
+    """
+    以嵌套树形式返回评论线程
+    
+    Query Parameters:
+        depth: 最大回复深度 (不超过 COMMENT_THREAD_MAX_DEPTH)
+        limit: 最多返回的评论数 (不超过 COMMENT_THREAD_MAX_NODES)
+    """
+    params = validate_request_data(CommentThreadSchema, {
+        key: value for key, value in request.args.items() if key in ('depth', 'limit')
+    })
+    max_depth = current_app.config['COMMENT_THREAD_MAX_DEPTH']
+    max_nodes = current_app.config['COMMENT_THREAD_MAX_NODES']
+    if params['depth'] is not None:
+        max_depth = min(params['depth'], max_depth)
+    if params['limit'] is not None:
+        max_nodes = min(params['limit'], max_nodes)
+    
+    # 一条递归CTE取出整个线程
+    thread = load_comment_thread(
+        article_id=article_id, root_id=root_id,
+        max_depth=max_depth, max_nodes=max_nodes
+    )
+    
+    # 内容未变化时直接返回304，跳过组装 (作者用户名也会出现在响应中，计入ETag)
+    etag = generate_etag(thread.truncated, [
+        (row.id, row.updated_at, row.reply_count, thread.authors.get(row.author_id)) for row in thread.rows
+    ])
+    last_modified = latest_modified(row.updated_at for row in thread.rows)
+    if is_not_modified(etag, last_modified):
+        return not_modified_response(etag, last_modified, weak=True)
+    
+    return with_validators(success_response(
+        data={
+            'comments': thread.to_tree(),
+            'total': thread.size,
+            'truncated': thread.truncated,
+            'max_depth': max_depth
+        },
+        message=f'获取到 {thread.size} 条评论'
+    ), etag, last_modified, weak=True)
+
 @comments_bp.route('', methods=['GET'])
+@response_cache.cached(tags=comment_list_cache_tags)
 def get_comments():
     """
     获取评论列表
@@ -55,6 +133,8 @@ def get_comments():
         order: 排序方向 (默认: desc)
         page: 页码 (默认: 1)
         per_page: 每页数量 (默认: 20)
+        cursor: 游标分页 (首页传空值，之后传上一页返回的 next_cursor，按created_at排序)
+        mode: 为 tree 时返回文章的完整评论树 (需要article_id，支持depth、limit参数)
     
     Returns:
         JSON: 评论列表和分页信息
@@ -63,14 +143,20 @@ def get_comments():
         # 获取查询参数
         args = request.args.to_dict()
         
+        # 评论树模式
+        if args.get('mode') == 'tree':
+            if not args.get('article_id', '').isdigit():
+                return error_response('评论树模式需要提供有效的article_id', status_code=400)
+            return comment_thread_response(article_id=int(args['article_id']))
+        
         # 验证分页参数
         pagination_data = validate_request_data(PaginationSchema, {
             'page': args.get('page', 1),
             'per_page': args.get('per_page', 20)
         })
         
-        # 构建查询
-        query = Comment.query
+        # 构建查询 (预加载作者和文章)
+        query = Comment.query.options(joinedload(Comment.author), joinedload(Comment.article))
         
         # 文章过滤
         article_id = args.get('article_id')
@@ -86,18 +172,35 @@ def get_comments():
         sort_field = args.get('sort', 'created_at')
         order = args.get('order', 'desc')
         
-        sort_column = getattr(Comment, sort_field, Comment.created_at)
-        if order == 'asc':
-            query = query.order_by(asc(sort_column))
+        if 'cursor' in args:
+            # 游标分页: 不使用OFFSET和COUNT
+            pagination = keyset_paginate(
+                query, Comment, 'created_at',
+                'asc' if order == 'asc' else 'desc',
+                pagination_data['per_page'],
+                cursor=args.get('cursor')
+            )
         else:
-            query = query.order_by(desc(sort_column))
-        
-        # 分页查询
-        pagination = query.paginate(
-            page=pagination_data['page'],
-            per_page=pagination_data['per_page'],
-            error_out=False
-        )
+            sort_column = getattr(Comment, sort_field, Comment.created_at)
+            if order == 'asc':
+                query = query.order_by(asc(sort_column))
+            else:
+                query = query.order_by(desc(sort_column))
+            
+            # 分页查询
+            pagination = query.paginate(
+                page=pagination_data['page'],
+                per_page=pagination_data['per_page'],
+                error_out=False
+            )
+        
+        # 内容未变化时直接返回304，跳过序列化
+        etag = generate_etag(pagination.total, getattr(pagination, 'next_cursor', None), [
+            comment_version(comment) for comment in pagination.items
+        ])
+        last_modified = latest_modified(comment.updated_at for comment in pagination.items)
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified, weak=True)
         
         # 序列化评论数据
         comments_data = []
@@ -115,22 +218,25 @@ def get_comments():
                     'title': comment.article.title
                 },
                 'parent_id': comment.parent_id,
-                'replies_count': comment.replies.count() if hasattr(comment, 'replies') else 0
+                'replies_count': comment.reply_count
             }
             comments_data.append(comment_data)
         
-        return paginated_response(
+        return with_validators(paginated_response(
             data=comments_data,
             page=pagination.page,
             per_page=pagination.per_page,
             total=pagination.total,
-            message=f'获取到 {pagination.total} 条评论'
-        )
+            message=f'获取到 {len(comments_data) if pagination.total is None else pagination.total} 条评论',
+            next_cursor=getattr(pagination, 'next_cursor', None)
+        ), etag, last_modified, weak=True)
         
     except ValidationError as e:
         return validation_error_response(
             errors=format_validation_errors(e.messages)
         )
+    except CursorError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f'获取评论列表失败: {str(e)}')
 
@@ -142,6 +248,9 @@ def get_comment(comment_id):
     Path Parameters:
         comment_id: 评论ID
     
+    Query Parameters:
+        mode: 为 tree 时返回该评论下的完整回复树 (支持depth、limit参数)
+    
     Returns:
         JSON: 评论详细信息
     """
@@ -150,8 +259,20 @@ def get_comment(comment_id):
         if not comment:
             return not_found_response('评论')
         
-        # 获取回复评论
-        replies = Comment.query.filter_by(parent_id=comment_id).order_by(Comment.created_at.asc()).all()
+        if request.args.get('mode') == 'tree':
+            return comment_thread_response(root_id=comment_id)
+        
+        # 获取回复评论 (预加载作者)
+        replies = Comment.query.options(joinedload(Comment.author))\
+            .filter_by(parent_id=comment_id).order_by(Comment.created_at.asc()).all()
+        
+        # 评论及其回复都未变化时直接返回304
+        etag = generate_etag(comment_version(comment), [
+            (reply.id, reply.updated_at, reply.author.username) for reply in replies
+        ])
+        last_modified = latest_modified(item.updated_at for item in [comment] + replies)
+        if is_not_modified(etag, last_modified):
+            return not_modified_response(etag, last_modified, weak=True)
         
         # 序列化评论数据
         comment_data = {
@@ -181,11 +302,15 @@ def get_comment(comment_id):
             ]
         }
         
-        return success_response(
+        return with_validators(success_response(
             data={'comment': comment_data},
             message='评论获取成功'
-        )
+        ), etag, last_modified, weak=True)
         
+    except ValidationError as e:
+        return validation_error_response(
+            errors=format_validation_errors(e.messages)
+        )
     except Exception as e:
         return error_response(f'获取评论失败: {str(e)}')
 
@@ -242,6 +367,9 @@ def create_comment():
         db.session.add(comment)
         db.session.commit()
         
+        # 通知文章作者 (后台执行，不阻塞请求)
+        task_queue.submit(send_comment_notification, article.title, article.author_id)
+        
         # 序列化评论数据
         comment_data = {
             'id': comment.id,
@@ -291,7 +419,7 @@ def update_comment(comment_id):
         JSON: 更新后的评论信息
     """
     try:
-        comment = Comment.query.get(comment_id)
+        comment = get_request_resource(Comment, comment_id)
         
         # 验证请求数据
         data = validate_request_data(CommentUpdateSchema, request.get_json() or {})
@@ -345,7 +473,7 @@ def delete_comment(comment_id):
         JSON: 删除结果
     """
     try:
-        comment = Comment.query.get(comment_id)
+        comment = get_request_resource(Comment, comment_id)
         
         # 删除评论 (级联删除回复)
         db.session.delete(comment)
@@ -6,16 +6,19 @@
 """
 
 import os
+import re
 import uuid
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, current_app, send_file, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
-from PIL import Image
 import mimetypes
 
 # 导入工具函数
-from utils.response import success_response, error_response
+from utils.response import success_response, error_response, not_found_response
+from utils.images import hash_file, image_worker, load_manifest, render_variants
+from utils.upload_stream import UploadError, ingest_upload, ingest_uploads
 from utils.validation import ValidationHelper
 
 # 创建蓝图
@@ -28,6 +31,69 @@ MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 MAX_IMAGE_SIZE = 5 * 1024 * 1024   # 5MB
 IMAGE_QUALITY = 85
 THUMBNAIL_SIZE = (300, 300)
+MAX_IMAGE_DIMENSIONS = (1920, 1080)
+
+# 文件服务
+SERVED_DIRECTORIES = {'images', 'files'}
+HIDDEN_SUFFIXES = ('.json', '.tmp', '.upload')  # 变体清单和处理中的临时文件
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{64}_(\d+|thumb)\.\w+$')
+UUID_NAME = re.compile(r'^(thumb_)?[0-9a-f]{32}(\.\w+)?$')
+
+def image_directory(digest):
+    """内容寻址的图片目录 (按哈希前两位分散到256个子目录)"""
+    return os.path.join(current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'images', digest[:2])
+
+def image_manifest_data(manifest):
+    """
+    变体清单转为响应数据
+    
+    url 为最大尺寸的JPEG (兼容只接受单个地址的 featured_image)，
+    srcset 按格式给出 "地址 宽度w" 列表，可直接用于 <picture>/<source>
+    """
+    base_url = f"/upload/images/{manifest['sha256'][:2]}"
+    variants = [
+        dict(variant, url=f"{base_url}/{variant['name']}")
+        for variant in manifest['variants']
+    ]
+    
+    srcset = {}
+    for variant in variants:
+        srcset.setdefault(variant['format'], []).append(f"{variant['url']} {variant['width']}w")
+    
+    fallback = next(
+        (variant for variant in variants if variant['format'] == 'jpeg'),
+        variants[0]
+    )
+    thumbnail = manifest.get('thumbnail')
+    
+    return {
+        'sha256': manifest['sha256'],
+        'filename': fallback['name'],
+        'url': fallback['url'],
+        'thumbnail_url': f"{base_url}/{thumbnail['name']}" if thumbnail else None,
+        'width': manifest['width'],
+        'height': manifest['height'],
+        'size': fallback['size'],
+        'mime_type': fallback['mime_type'],
+        'variants': variants,
+        'srcset': {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
+    }
+
+def image_job_data(job):
+    """图片处理任务的响应数据 (处理完成后补充变体清单)"""
+    file_data = dict(job['meta'])
+    if job['result']:
+        file_data.update(image_manifest_data(job['result']))
+    
+    return {
+        'job': {
+            'id': job['job_id'],
+            'status': job['status'],
+            'error': '图片处理失败' if job['status'] == 'failed' else None,  # 详细原因只记录在日志中
+            'status_url': url_for('upload.get_image_job', job_id=job['job_id'])
+        },
+        'file': file_data
+    }
 
 def allowed_file(filename, file_type='image'):
     """检查文件扩展名是否允许"""
@@ -43,13 +109,6 @@ def allowed_file(filename, file_type='image'):
     else:
         return extension in (ALLOWED_IMAGE_EXTENSIONS | ALLOWED_FILE_EXTENSIONS)
 
-def get_file_size(file):
-    """获取文件大小"""
-    file.seek(0, 2)  # 移动到文件末尾
-    size = file.tell()
-    file.seek(0)     # 重置到文件开头
-    return size
-
 def generate_unique_filename(original_filename):
     """生成唯一文件名"""
     extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
@@ -69,49 +128,70 @@ def create_upload_directory(upload_type='images'):
     os.makedirs(upload_dir, exist_ok=True)
     return upload_dir
 
-def process_image(image_path, max_size=(1920, 1080)):
-    """处理图片：压缩和调整大小"""
-    try:
-        with Image.open(image_path) as img:
-            # 转换为RGB模式（如果是RGBA）
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # 调整大小（保持比例）
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # 保存压缩后的图片
-            img.save(image_path, 'JPEG', quality=IMAGE_QUALITY, optimize=True)
-            
-        return True
-    except Exception as e:
-        current_app.logger.error(f'图片处理失败: {str(e)}')
-        return False
+def incoming_image_path(original_filename):
+    """校验图片文件名并返回原始文件的暂存路径"""
+    if not allowed_file(original_filename, 'image'):
+        raise UploadError(
+            f'不支持的文件类型，支持的格式: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}'
+        )
+    return os.path.join(create_upload_directory('incoming'), f'{uuid.uuid4().hex}.upload')
 
-def create_thumbnail(image_path, thumbnail_path):
-    """创建缩略图"""
-    try:
-        with Image.open(image_path) as img:
-            # 转换为RGB模式
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # 创建缩略图
-            img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-            img.save(thumbnail_path, 'JPEG', quality=IMAGE_QUALITY, optimize=True)
-            
-        return True
-    except Exception as e:
-        current_app.logger.error(f'缩略图创建失败: {str(e)}')
-        return False
+def submit_image(upload, create_thumb, uploaded_by):
+    """
+    为已接收的图片提交变体生成任务
+    
+    Args:
+        upload: ingest_upload 接收的原始图片
+        create_thumb: 是否生成缩略图
+        uploaded_by: 上传者ID
+    
+    Returns:
+        Tuple[Optional[str], Dict]: (任务ID, 文件信息)，相同内容已处理过时任务ID为None，
+        文件信息中已包含已有的变体清单
+    """
+    digest = upload.sha256
+    dest_dir = image_directory(digest)
+    os.makedirs(dest_dir, exist_ok=True)
+    
+    file_data = {
+        'original_filename': upload.filename,
+        'uploaded_by': uploaded_by,
+        'uploaded_at': datetime.now().isoformat()
+    }
+    
+    manifest = load_manifest(dest_dir, digest)
+    if manifest and (manifest['thumbnail'] or not create_thumb):
+        os.remove(upload.path)
+        file_data.update(image_manifest_data(manifest))
+        return None, file_data
+    
+    job_id = image_worker.submit(
+        render_variants, upload.path, dest_dir, digest,
+        current_app.config.get('IMAGE_VARIANT_WIDTHS', (320, 640, 1024, 1600)),
+        current_app.config.get('IMAGE_VARIANT_FORMATS', ('webp', 'jpeg')),
+        MAX_IMAGE_DIMENSIONS,
+        THUMBNAIL_SIZE if create_thumb else None,
+        IMAGE_QUALITY,
+        meta=file_data
+    )
+    return job_id, file_data
+
+def stored_file_data(upload, uploaded_by):
+    """已保存的普通文件的响应数据"""
+    filename = os.path.basename(upload.path)
+    month = os.path.basename(os.path.dirname(upload.path))
+    year = os.path.basename(os.path.dirname(os.path.dirname(upload.path)))
+    
+    return {
+        'filename': filename,
+        'original_filename': upload.filename,
+        'url': f"/upload/files/{year}/{month}/{filename}",
+        'size': upload.size,
+        'sha256': upload.sha256,
+        'mime_type': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        'uploaded_by': uploaded_by,
+        'uploaded_at': datetime.now().isoformat()
+    }
 
 @upload_bp.route('/image', methods=['POST'])
 @jwt_required()
@@ -119,6 +199,10 @@ def upload_image():
     """
     上传图片
     
+    图片交给图片处理工作池生成多个宽度的WebP/JPEG变体，接口保存原始文件后立即返回202和任务ID，
+    客户端通过 GET /upload/jobs/<job_id> 查询处理结果和 srcset 清单；
+    相同内容的图片已经处理过时直接返回200和已有的变体
+    
     Headers:
         Authorization: Bearer <access_token>
     
@@ -127,85 +211,55 @@ def upload_image():
         create_thumbnail: 是否创建缩略图 (可选，默认false)
     
     Returns:
-        JSON: 上传结果和文件信息
+        JSON: 任务信息和处理完成后的文件地址
     """
     try:
         current_user_id = get_jwt_identity()
         
-        # 检查是否有文件
-        if 'file' not in request.files:
-            return error_response('未选择文件', status_code=400)
-        
-        file = request.files['file']
-        if file.filename == '':
-            return error_response('未选择文件', status_code=400)
+        # 边接收边写入原始文件并计算内容哈希，处理完成后由工作进程删除
+        form, upload = ingest_upload(request, incoming_image_path, MAX_IMAGE_SIZE)
+        create_thumb = form.get('create_thumbnail', 'false').lower() == 'true'
+        job_id, file_data = submit_image(upload, create_thumb, current_user_id)
         
-        # 检查文件类型
-        if not allowed_file(file.filename, 'image'):
-            return error_response(
-                f'不支持的文件类型，支持的格式: {", ".join(ALLOWED_IMAGE_EXTENSIONS)}',
-                status_code=400
+        # 相同内容已经处理过时直接返回已有的变体
+        if job_id is None:
+            return success_response(
+                data={'job': None, 'file': file_data, 'deduplicated': True},
+                message='图片上传成功'
             )
         
-        # 检查文件大小
-        file_size = get_file_size(file)
-        if file_size > MAX_IMAGE_SIZE:
-            return error_response(
-                f'文件大小超过限制 ({MAX_IMAGE_SIZE // (1024*1024)}MB)',
-                status_code=400
-            )
-        
-        # 生成文件名和路径
-        filename = generate_unique_filename(file.filename)
-        upload_dir = create_upload_directory('images')
-        file_path = os.path.join(upload_dir, filename)
-        
-        # 保存文件
-        file.save(file_path)
-        
-        # 处理图片
-        if not process_image(file_path):
-            os.remove(file_path)
-            return error_response('图片处理失败', status_code=500)
-        
-        # 创建缩略图（如果需要）
-        thumbnail_url = None
-        create_thumb = request.form.get('create_thumbnail', 'false').lower() == 'true'
-        if create_thumb:
-            thumbnail_filename = f"thumb_{filename}"
-            thumbnail_path = os.path.join(upload_dir, thumbnail_filename)
-            
-            if create_thumbnail(file_path, thumbnail_path):
-                thumbnail_url = f"/upload/images/{datetime.now().strftime('%Y/%m')}/{thumbnail_filename}"
-        
-        # 获取文件信息
-        file_info = os.stat(file_path)
-        mime_type = mimetypes.guess_type(file_path)[0] or 'image/jpeg'
-        
-        # 构建响应数据
-        file_url = f"/upload/images/{datetime.now().strftime('%Y/%m')}/{filename}"
-        
-        response_data = {
-            'file': {
-                'filename': filename,
-                'original_filename': file.filename,
-                'url': file_url,
-                'thumbnail_url': thumbnail_url,
-                'size': file_info.st_size,
-                'mime_type': mime_type,
-                'uploaded_by': current_user_id,
-                'uploaded_at': datetime.now().isoformat()
-            }
-        }
-        
         return success_response(
-            data=response_data,
-            message='图片上传成功'
+            data=image_job_data(image_worker.status(job_id)),
+            message='图片已上传，正在处理',
+            status_code=202
         )
         
+    except UploadError as e:
+        return error_response(e.message, status_code=e.status_code)
     except Exception as e:
         return error_response(f'图片上传失败: {str(e)}')
 
+@upload_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_image_job(job_id):
+    """
+    查询图片处理任务状态
+    
+    Path Parameters:
+        job_id: 上传接口返回的任务ID
+    
+    Headers:
+        Authorization: Bearer <access_token>
+    
+    Returns:
+        JSON: 任务状态 (pending / processing / done / failed) 和文件信息
+    """
+    job = image_worker.status(job_id)
+    if not job or str(job['meta'].get('uploaded_by')) != str(get_jwt_identity()):
+        return not_found_response('任务')
+    
+    return success_response(data=image_job_data(job))
+
 @upload_bp.route('/file', methods=['POST'])
 @jwt_required()
 def upload_file():
@@ -224,81 +278,201 @@ def upload_file():
     try:
         current_user_id = get_jwt_identity()
         
-        # 检查是否有文件
-        if 'file' not in request.files:
-            return error_response('未选择文件', status_code=400)
+        # 边接收边写入最终路径
+        upload_dir = create_upload_directory('files')
         
-        file = request.files['file']
-        if file.filename == '':
-            return error_response('未选择文件', status_code=400)
+        def destination(original_filename):
+            if not allowed_file(original_filename, 'file'):
+                raise UploadError(
+                    f'不支持的文件类型，支持的格式: {", ".join(ALLOWED_FILE_EXTENSIONS)}'
+                )
+            return os.path.join(upload_dir, generate_unique_filename(original_filename))
         
-        # 检查文件类型
-        if not allowed_file(file.filename, 'file'):
-            return error_response(
-                f'不支持的文件类型，支持的格式: {", ".join(ALLOWED_FILE_EXTENSIONS)}',
-                status_code=400
-            )
+        _, upload = ingest_upload(request, destination, MAX_FILE_SIZE)
+        response_data = {'file': stored_file_data(upload, current_user_id)}
         
-        # 检查文件大小
-        file_size = get_file_size(file)
-        if file_size > MAX_FILE_SIZE:
-            return error_response(
-                f'文件大小超过限制 ({MAX_FILE_SIZE // (1024*1024)}MB)',
-                status_code=400
-            )
+        return success_response(
+            data=response_data,
+            message='文件上传成功'
+        )
         
-        # 生成文件名和路径
-        filename = generate_unique_filename(file.filename)
-        upload_dir = create_upload_directory('files')
-        file_path = os.path.join(upload_dir, filename)
+    except UploadError as e:
+        return error_response(e.message, status_code=e.status_code)
+    except Exception as e:
+        return error_response(f'文件上传失败: {str(e)}')
+
+@upload_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def upload_batch():
+    """
+    批量上传
+    
+    一个请求携带多个文件，图片并行提交到图片处理工作池，其他文件直接保存；
+    等待图片处理完成 (最多 BATCH_UPLOAD_WAIT_TIMEOUT 秒) 后按上传顺序返回每个文件的结果，
+    单个文件失败不影响其他文件，超时未完成的图片返回任务地址供继续轮询
+    
+    Headers:
+        Authorization: Bearer <access_token>
+    
+    Form Data:
+        files: 文件 (可以有多个，最多 BATCH_UPLOAD_MAX_FILES 个)
+        create_thumbnail: 是否为图片创建缩略图 (可选，默认false)
+    
+    Returns:
+        JSON: 每个文件的结果，全部成功返回200，部分失败返回207
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # 目录在整批上传开始前创建一次
+        incoming_dir = create_upload_directory('incoming')
+        files_dir = create_upload_directory('files')
+        
+        def destination(original_filename):
+            if allowed_file(original_filename, 'image'):
+                return os.path.join(incoming_dir, f'{uuid.uuid4().hex}.upload')
+            if allowed_file(original_filename, 'file'):
+                return os.path.join(files_dir, generate_unique_filename(original_filename))
+            raise UploadError('不支持的文件类型')
+        
+        def max_size(original_filename):
+            return MAX_IMAGE_SIZE if allowed_file(original_filename, 'image') else MAX_FILE_SIZE
         
-        # 保存文件
-        file.save(file_path)
+        form, uploads = ingest_uploads(
+            request, destination, max_size,
+            fields=('files', 'file'),
+            max_files=current_app.config.get('BATCH_UPLOAD_MAX_FILES', 20)
+        )
+        create_thumb = form.get('create_thumbnail', 'false').lower() == 'true'
         
-        # 获取文件信息
-        file_info = os.stat(file_path)
-        mime_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        results = []
+        jobs = {}
+        for index, upload in enumerate(uploads):
+            result = {'original_filename': upload.filename, 'status': 'done', 'error': None, 'job': None, 'file': None}
+            results.append(result)
+            
+            if upload.error:
+                result.update(status='failed', error=upload.error)
+            elif upload.path.endswith('.upload'):
+                try:
+                    job_id, result['file'] = submit_image(upload, create_thumb, current_user_id)
+                    if job_id is not None:
+                        jobs[index] = job_id
+                except Exception as e:
+                    current_app.logger.error(f'提交图片处理任务失败: {e}')
+                    result.update(status='failed', error='图片处理失败')
+            else:
+                result['file'] = stored_file_data(upload, current_user_id)
         
-        # 构建响应数据
-        file_url = f"/upload/files/{datetime.now().strftime('%Y/%m')}/{filename}"
+        # 所有图片任务已经同时在工作池中执行，这里统一等待
+        image_worker.wait(jobs.values(), timeout=current_app.config.get('BATCH_UPLOAD_WAIT_TIMEOUT', 30))
+        for index, job_id in jobs.items():
+            job_data = image_job_data(image_worker.status(job_id))
+            results[index].update(
+                status=job_data['job']['status'],
+                error=job_data['job']['error'],
+                job=job_data['job'],
+                file=job_data['file']
+            )
         
-        response_data = {
-            'file': {
-                'filename': filename,
-                'original_filename': file.filename,
-                'url': file_url,
-                'size': file_info.st_size,
-                'mime_type': mime_type,
-                'uploaded_by': current_user_id,
-                'uploaded_at': datetime.now().isoformat()
-            }
-        }
+        failed = sum(1 for result in results if result['status'] == 'failed')
+        summary = {'total': len(results), 'succeeded': len(results) - failed, 'failed': failed}
+        if failed == len(results):
+            return error_response('文件上传失败', details={'results': results, **summary})
         
         return success_response(
-            data=response_data,
-            message='文件上传成功'
+            data={'results': results, **summary},
+            message='批量上传完成' if not failed else '部分文件上传失败',
+            status_code=207 if failed else 200
         )
         
+    except UploadError as e:
+        return error_response(e.message, status_code=e.status_code)
     except Exception as e:
-        return error_response(f'文件上传失败: {str(e)}')
+        return error_response(f'批量上传失败: {str(e)}')
+
+_digest_cache = {}
+
+def file_digest(path, mtime_ns, size):
+    """文件内容的SHA-256 (以修改时间和大小作为缓存键，每个文件只读一遍)"""
+    key = (path, mtime_ns, size)
+    digest = _digest_cache.get(key)
+    if digest is None:
+        digest = hash_file(path)
+        if len(_digest_cache) >= 1024:
+            _digest_cache.pop(next(iter(_digest_cache)))
+        _digest_cache[key] = digest
+    return digest
+
+def is_immutable_file(name):
+    """内容寻址或UUID命名的文件，内容永远不会改变"""
+    return bool(CONTENT_ADDRESSED_NAME.match(name) or UUID_NAME.match(name))
 
 @upload_bp.route('/<path:file_type>/<path:filename>')
 def serve_file(file_type, filename):
     """
     提供文件访问服务
     
+    UPLOAD_SEND_MODE 为 x-accel-redirect / x-sendfile 时只返回响应头，由前置的
+    Nginx/Apache直接发送文件，不占用Python工作线程；否则由werkzeug发送
+    (WSGI服务器提供 wsgi.file_wrapper 时使用 sendfile 零拷贝)，支持Range和条件请求
+    
     Path Parameters:
         file_type: 文件类型目录 (images/files)
-        filename: 文件路径 (包含年/月/文件名)
+        filename: 文件路径 (包含子目录和文件名)
     
     Returns:
-        File: 请求的文件
+        File: 请求的文件，不存在时返回不带响应体的404
     """
+    upload_folder = os.fspath(current_app.config.get('UPLOAD_FOLDER', 'uploads'))
+    name = os.path.basename(filename)
+    relative_path = safe_join(file_type, filename)
+    
+    if file_type not in SERVED_DIRECTORIES or relative_path is None or name.endswith(HIDDEN_SUFFIXES):
+        return current_app.response_class(status=404)
+    
+    file_path = os.path.abspath(os.path.join(upload_folder, relative_path))
     try:
-        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-        file_path = os.path.join(upload_folder, file_type)
-        
-        return send_from_directory(file_path, filename)
-        
-    except Exception as e:
-        return error_response(f'文件访问失败: {str(e)}', status_code=404)
+        stat = os.stat(file_path)
+    except OSError:
+        return current_app.response_class(status=404)
+    if not os.path.isfile(file_path):
+        return current_app.response_class(status=404)
+    
+    # 内容寻址的文件名已包含内容哈希，其他文件计算一次SHA-256作为强ETag
+    match = CONTENT_ADDRESSED_NAME.match(name)
+    etag = name if match else file_digest(file_path, stat.st_mtime_ns, stat.st_size)
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    immutable = is_immutable_file(name)
+    max_age = current_app.config.get('UPLOAD_CACHE_MAX_AGE', 31536000) if immutable else 3600
+    
+    send_mode = current_app.config.get('UPLOAD_SEND_MODE', 'direct')
+    if send_mode in ('x-accel-redirect', 'x-sendfile'):
+        response = current_app.response_class(mimetype=mimetype)
+        if send_mode == 'x-accel-redirect':
+            prefix = current_app.config.get('UPLOAD_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+            response.headers['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + relative_path.replace(os.sep, '/')
+        else:
+            response.headers['X-Sendfile'] = file_path
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        # 验证器命中时直接返回304，Range由前置服务器处理
+        response.make_conditional(request.environ)
+        if response.status_code == 304:
+            response.headers.pop('X-Accel-Redirect', None)
+            response.headers.pop('X-Sendfile', None)
+    else:
+        response = send_file(
+            file_path,
+            mimetype=mimetype,
+            conditional=True,
+            etag=etag,
+            last_modified=stat.st_mtime,
+            max_age=max_age
+        )
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if immutable:
+        response.cache_control.immutable = True
+    return response
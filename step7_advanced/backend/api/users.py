@@ -8,7 +8,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-from sqlalchemy import desc, asc, func
+from sqlalchemy import desc, asc
+from sqlalchemy.orm import defer, joinedload
 
 # 导入数据库模型
 from models import db, User, Article, Comment
@@ -22,7 +23,9 @@ from utils.validation import (
     validate_request_data, format_validation_errors,
     UserProfileUpdateSchema, PaginationSchema
 )
-from middleware.auth import admin_required
+from utils.cache import response_cache
+from utils.pagination import CursorError, keyset_paginate
+from middleware.auth import admin_required, get_request_resource, principal_cache
 
 # 创建蓝图
 users_bp = Blueprint('users', __name__)
@@ -39,6 +42,7 @@ def get_users():
         order: 排序方向 (默认: desc)
         page: 页码 (默认: 1)
         per_page: 每页数量 (默认: 20)
+        cursor: 游标分页 (首页传空值，之后传上一页返回的 next_cursor)
     
     Returns:
         JSON: 用户列表和分页信息
@@ -71,18 +75,28 @@ def get_users():
         sort_field = args.get('sort', 'created_at')
         order = args.get('order', 'desc')
         
-        sort_column = getattr(User, sort_field, User.created_at)
-        if order == 'asc':
-            query = query.order_by(asc(sort_column))
+        if 'cursor' in args:
+            # 游标分页: 不使用OFFSET和COUNT
+            pagination = keyset_paginate(
+                query, User,
+                sort_field if sort_field in ('created_at', 'username') else 'created_at',
+                'asc' if order == 'asc' else 'desc',
+                pagination_data['per_page'],
+                cursor=args.get('cursor')
+            )
         else:
-            query = query.order_by(desc(sort_column))
-        
-        # 分页查询
-        pagination = query.paginate(
-            page=pagination_data['page'],
-            per_page=pagination_data['per_page'],
-            error_out=False
-        )
+            sort_column = getattr(User, sort_field, User.created_at)
+            if order == 'asc':
+                query = query.order_by(asc(sort_column))
+            else:
+                query = query.order_by(desc(sort_column))
+            
+            # 分页查询
+            pagination = query.paginate(
+                page=pagination_data['page'],
+                per_page=pagination_data['per_page'],
+                error_out=False
+            )
         
         # 序列化用户数据
         users_data = []
@@ -95,8 +109,8 @@ def get_users():
                 'created_at': user.created_at.isoformat(),
                 'last_login': user.last_login.isoformat() if user.last_login else None,
                 'login_count': user.login_count,
-                'articles_count': user.articles.count(),
-                'comments_count': user.comments.count()
+                'articles_count': user.article_count,
+                'comments_count': user.comment_count
             }
             users_data.append(user_data)
         
@@ -105,17 +119,21 @@ def get_users():
             page=pagination.page,
             per_page=pagination.per_page,
             total=pagination.total,
-            message=f'获取到 {pagination.total} 个用户'
+            message=f'获取到 {len(users_data) if pagination.total is None else pagination.total} 个用户',
+            next_cursor=getattr(pagination, 'next_cursor', None)
         )
         
     except ValidationError as e:
         return validation_error_response(
             errors=format_validation_errors(e.messages)
         )
+    except CursorError as e:
+        return error_response(str(e), status_code=400)
     except Exception as e:
         return error_response(f'获取用户列表失败: {str(e)}')
 
 @users_bp.route('/<int:user_id>', methods=['GET'])
+@response_cache.cached(tags=lambda payload, user_id: [f'user:{user_id}'])
 def get_user(user_id):
     """
     获取用户详情
@@ -127,18 +145,20 @@ def get_user(user_id):
         JSON: 用户详细信息
     """
     try:
-        user = User.query.get(user_id)
+        # 用户和统计快照一次主键查询取出
+        user = User.query.options(joinedload(User.stats)).filter_by(id=user_id).first()
         if not user:
             return not_found_response('用户')
         
-        # 获取用户统计信息
-        articles_count = user.articles.filter_by(is_published=True).count()
-        comments_count = user.comments.count()
-        total_views = db.session.query(func.sum(Article.views)).filter_by(author_id=user_id, is_published=True).scalar() or 0
-        total_likes = db.session.query(func.sum(Article.likes)).filter_by(author_id=user_id, is_published=True).scalar() or 0
+        # 获取用户统计信息 (计数列 + 统计快照，不再执行聚合查询)
+        articles_count = user.published_article_count
+        comments_count = user.comment_count
+        total_views = user.stats.total_views if user.stats else 0
+        total_likes = user.stats.total_likes if user.stats else 0
         
-        # 获取最近文章
-        recent_articles = user.articles.filter_by(is_published=True).order_by(desc(Article.created_at)).limit(5).all()
+        # 获取最近文章 (只输出标题和计数，不加载正文)
+        recent_articles = user.articles.options(defer(Article.content))\
+            .filter_by(is_published=True).order_by(desc(Article.created_at)).limit(5).all()
         
         # 序列化用户数据
         user_data = {
@@ -189,17 +209,17 @@ def get_current_user():
     """
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = User.query.options(joinedload(User.stats)).filter_by(id=current_user_id).first()
         
         if not user:
             return not_found_response('用户')
         
-        # 获取用户统计信息
-        articles_count = user.articles.filter_by(is_published=True).count()
-        draft_count = user.articles.filter_by(is_published=False).count()
-        comments_count = user.comments.count()
-        total_views = db.session.query(func.sum(Article.views)).filter_by(author_id=current_user_id, is_published=True).scalar() or 0
-        total_likes = db.session.query(func.sum(Article.likes)).filter_by(author_id=current_user_id, is_published=True).scalar() or 0
+        # 获取用户统计信息 (计数列 + 统计快照，不再执行聚合查询)
+        articles_count = user.published_article_count
+        draft_count = user.article_count - user.published_article_count
+        comments_count = user.comment_count
+        total_views = user.stats.total_views if user.stats else 0
+        total_likes = user.stats.total_likes if user.stats else 0
         
         # 序列化用户数据
         user_data = {
@@ -309,13 +329,14 @@ def toggle_user_status(user_id):
         JSON: 操作结果
     """
     try:
-        user = User.query.get(user_id)
+        user = get_request_resource(User, user_id)
         if not user:
             return not_found_response('用户')
         
         # 切换用户状态
         user.is_active = not user.is_active
         db.session.commit()
+        principal_cache.invalidate(user_id)
         
         status_text = '激活' if user.is_active else '禁用'
         
@@ -19,12 +19,24 @@ from config import get_config
 # 导入数据库模型
 import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '../step5_database'))
-from models import db, User, Article, Comment, Tag
+from models import (
+    db, User, Article, Comment, Tag,
+    ensure_counter_columns, ensure_excerpt_column, rebuild_excerpts, recount_counters
+)
 
 # 导入工具和中间件
 from utils.response import error_response, internal_error_response
 from utils.jwt_helper import TokenBlacklist
-from middleware.auth import AuthMiddleware
+from utils.counter_buffer import counter_buffer
+from utils.search import search_index
+from utils.tasks import task_queue
+from utils.cache import response_cache
+from utils.revocation import revocation_store
+from utils.rate_limit import rate_limiter
+from utils.images import image_worker
+from utils.json_codec import json_codec
+from utils.engine_profile import init_database
+from middleware.auth import AuthMiddleware, principal_cache
 
 # 导入API蓝图
 from api.auth import auth_bp
@@ -69,8 +81,32 @@ def create_app(config_name=None):
 def init_extensions(app):
     """初始化Flask扩展"""
     
-    # 初始化数据库
-    db.init_app(app)
+    # 初始化JSON序列化后端
+    json_codec.init_app(app)
+    
+    # 初始化数据库 (按配置档设置连接池和SQLite PRAGMA)
+    init_database(app, db)
+    
+    # 初始化浏览量/点赞计数写缓冲
+    counter_buffer.init_app(app)
+    
+    # 初始化后台任务队列
+    task_queue.init_app(app)
+    
+    # 初始化响应缓存
+    response_cache.init_app(app)
+    
+    # 初始化令牌撤销存储
+    revocation_store.init_app(app)
+    
+    # 初始化权限快照缓存
+    principal_cache.init_app(app)
+    
+    # 初始化用户级限流器
+    rate_limiter.init_app(app)
+    
+    # 初始化图片处理工作池
+    image_worker.init_app(app)
     
     # 初始化CORS
     CORS(app, 
@@ -308,6 +344,29 @@ def register_cli_commands(app):
             print('✅ 示例数据创建完成')
         else:
             print('⚠️  示例数据已存在')
+    
+    @app.cli.command()
+    def recount():
+        """重建文章数、评论数、回复数等计数器以及用户统计快照 (旧数据库缺少计数列时先添加)"""
+        for column in ensure_counter_columns():
+            print(f'✅ 已添加计数列 {column}')
+        recount_counters()
+        print('✅ 计数器重建完成')
+    
+    @app.cli.command('rebuild-excerpts')
+    def rebuild_excerpts_command():
+        """重新生成文章列表使用的正文摘录 (旧数据库缺少 excerpt 列时先添加)"""
+        if ensure_excerpt_column():
+            print('✅ 已为文章表添加 excerpt 列')
+        print(f'✅ 已更新 {rebuild_excerpts()} 篇文章的摘录')
+    
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """重建文章全文搜索索引"""
+        if search_index.rebuild():
+            print('✅ 全文搜索索引重建完成')
+        else:
+            print('⚠️  当前数据库不支持FTS5，搜索将使用LIKE查询')
 
 # 创建应用实例
 app = create_app()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON序列化后端基准测试
+
+用与文章列表接口相同结构的响应比较:
+    jsonify: 原来的 flask.jsonify (标准库json，排序键并转义非ASCII字符)
+    json:    StdlibJSONBackend
+    orjson:  OrjsonBackend (已安装时)
+
+用法:
+    python benchmarks/bench_json.py [--per-page 20] [--number 2000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify
+
+from utils.json_codec import OrjsonBackend, StdlibJSONBackend
+
+def article_list_payload(per_page: int, native_datetimes: bool) -> dict:
+    """构造一页文章列表响应 (与 paginated_response 的结构一致)"""
+    now = datetime(2024, 1, 1, 8, 30, 15, 123456)
+    articles = []
+    for i in range(per_page):
+        created_at = now - timedelta(days=i, minutes=i)
+        articles.append({
+            'id': i + 1,
+            'title': f'Flask 高级特性实践 第{i + 1}篇',
+            'summary': '本文介绍缓存、限流、异步任务和图片处理等内容，' * 4,
+            'slug': f'flask-advanced-{i + 1}',
+            'is_published': True,
+            'featured_image': f'/upload/images/{i:02x}/{i:064x}_1024.jpg',
+            'views': 1000 + i * 37,
+            'likes': 10 + i,
+            'created_at': created_at if native_datetimes else created_at.isoformat(),
+            'updated_at': created_at if native_datetimes else created_at.isoformat(),
+            'author': {'id': i % 5 + 1, 'username': f'author{i % 5}'},
+            'tags': [{'id': t, 'name': f'标签{t}'} for t in range(i % 4 + 1)],
+            'comment_count': i * 3
+        })
+    return {
+        'success': True,
+        'code': 'SUCCESS',
+        'message': '获取文章列表成功',
+        'timestamp': now.isoformat() + 'Z',
+        'data': articles,
+        'pagination': {
+            'page': 1, 'per_page': per_page, 'total': 500, 'pages': 500 // per_page + 1,
+            'has_prev': False, 'has_next': True
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON序列化后端基准测试')
+    parser.add_argument('--per-page', type=int, default=20, help='每页文章数')
+    parser.add_argument('--number', type=int, default=2000, help='每个后端的编码次数')
+    options = parser.parse_args()
+
+    app = Flask(__name__)
+    iso_payload = article_list_payload(options.per_page, native_datetimes=False)
+    native_payload = article_list_payload(options.per_page, native_datetimes=True)
+
+    cases = [('jsonify', lambda: jsonify(iso_payload).get_data())]
+    backends = [StdlibJSONBackend()]
+    try:
+        backends.append(OrjsonBackend())
+    except ImportError:
+        print('未安装orjson，跳过orjson后端')
+    for backend in backends:
+        cases.append((backend.name, lambda b=backend: b.dumps(iso_payload)))
+        cases.append((f'{backend.name} (datetime)', lambda b=backend: b.dumps(native_payload)))
+
+    print(f'文章列表 per_page={options.per_page}，每项 {options.number} 次')
+    with app.app_context():
+        baseline = None
+        for name, func in cases:
+            size = len(func())
+            seconds = min(timeit.repeat(func, number=options.number, repeat=3))
+            per_call = seconds / options.number * 1e6
+            baseline = baseline or per_call
+            print(f'  {name:<20} {per_call:8.1f} us/次  {size:6d} 字节  {baseline / per_call:5.1f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求参数验证基准测试
+
+比较文章列表 (PaginationSchema) 和搜索 (SearchSchema + PaginationSchema) 每个请求的验证开销:
+    new instance: 原来的做法，每次调用都创建模式实例
+    cached:       复用缓存的模式实例，仍走marshmallow的通用加载流程
+    fast path:    validate_request_data (简单模式使用预编译的快速加载函数)
+
+用法:
+    python benchmarks/bench_validation.py [--number 20000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.validation import PaginationSchema, SearchSchema, get_schema, validate_request_data
+
+PAGINATION_ARGS = {'page': '3', 'per_page': '20'}
+SEARCH_ARGS = {'q': 'flask', 'sort': 'views', 'order': 'desc'}
+
+def list_request(load):
+    load(PaginationSchema, PAGINATION_ARGS)
+
+def search_request(load):
+    load(SearchSchema, SEARCH_ARGS)
+    load(PaginationSchema, PAGINATION_ARGS)
+
+STRATEGIES = (
+    ('new instance', lambda schema_class, data: schema_class().load(data)),
+    ('cached', lambda schema_class, data: get_schema(schema_class).load(data)),
+    ('fast path', validate_request_data),
+)
+
+def main():
+    parser = argparse.ArgumentParser(description='请求参数验证基准测试')
+    parser.add_argument('--number', type=int, default=20000, help='每项的请求次数')
+    options = parser.parse_args()
+
+    print(f'每项 {options.number} 次请求')
+    for title, request in (('文章列表', list_request), ('搜索', search_request)):
+        print(f'{title}:')
+        baseline = None
+        for name, load in STRATEGIES:
+            seconds = min(timeit.repeat(lambda: request(load), number=options.number, repeat=3))
+            per_call = seconds / options.number * 1e6
+            baseline = baseline or per_call
+            print(f'  {name:<14} {per_call:7.2f} us/请求  节省 {baseline - per_call:6.2f} us  {baseline / per_call:5.1f}x')
+
+if __name__ == '__main__':
+    main()
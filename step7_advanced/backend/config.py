@@ -22,10 +22,11 @@ class Config:
     # 数据库配置
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{BASE_DIR}/blog.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 300,
-    }
+    DATABASE_ENGINE_PROFILE = 'development'  # 引擎配置档 (见 utils/engine_profile.py)
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # 显式的引擎参数，覆盖配置档中的同名参数
+    
+    # JSON序列化配置
+    JSON_BACKEND = 'auto'  # auto (安装了orjson时使用) / orjson / json (标准库)
     
     # JWT配置
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or SECRET_KEY
@@ -33,6 +34,17 @@ class Config:
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
     JWT_ALGORITHM = 'HS256'
     
+    # 令牌撤销 (登出) 配置
+    TOKEN_REVOCATION_BACKEND = 'database'  # memory (单进程) / database / redis
+    TOKEN_REVOCATION_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/2'
+    # 从共享后端同步撤销列表的间隔 (秒)；其他进程撤销的令牌在本进程中最长要过这么久才会被拒绝
+    TOKEN_REVOCATION_SYNC_INTERVAL = 5
+    TOKEN_REVOCATION_SWEEP_INTERVAL = 300  # 清理过期记录的间隔 (秒)
+    
+    # 权限装饰器缓存用户 (is_admin, is_active) 的时间 (秒)，0 表示每次请求都查询
+    AUTH_PRINCIPAL_CACHE_TTL = 30
+    AUTH_PRINCIPAL_CACHE_SIZE = 10000  # 每个进程最多缓存的用户数 (超出时淘汰最久未使用的)
+    
     # CORS配置
     CORS_ORIGINS = ['http://localhost:3000', 'http://127.0.0.1:3000']
     CORS_ALLOW_HEADERS = ['Content-Type', 'Authorization']
@@ -55,9 +67,52 @@ class Config:
     RATELIMIT_STORAGE_URL = 'memory://'
     RATELIMIT_DEFAULT = '100 per hour'
     
+    # 用户级限流 (令牌桶，按用户ID或IP计数)
+    USER_RATELIMIT_BACKEND = 'memory'  # memory (单进程) / redis
+    USER_RATELIMIT_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+    USER_RATELIMIT_COMPACT_INTERVAL = 60  # 清理空闲令牌桶的间隔 (秒)
+    SEARCH_RATELIMIT = '120 per minute'
+    SEARCH_RATELIMIT_ANONYMOUS = '20 per minute'
+    EXPORT_RATELIMIT = '10 per hour'
+    
     # 缓存配置
-    CACHE_TYPE = 'simple'
+    CACHE_TYPE = 'simple'  # simple (进程内LRU) / redis / null (禁用)
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_THRESHOLD = 1000  # 进程内缓存最大条目数
+    CACHE_KEY_PREFIX = 'blog:'
+    
+    # 浏览量/点赞计数写缓冲配置
+    COUNTER_BUFFER_ENABLED = True
+    COUNTER_FLUSH_INTERVAL = 5  # 定时写回间隔 (秒)
+    COUNTER_FLUSH_THRESHOLD = 500  # 累计增量达到该值时立即写回
+    
+    # 后台任务队列配置
+    TASK_QUEUE_MODE = 'thread'  # thread / asyncio / sync
+    TASK_QUEUE_WORKERS = 2
+    TASK_QUEUE_MAXSIZE = 1000
+    TASK_MAX_RETRIES = 3
+    TASK_RETRY_BACKOFF = 1.0  # 首次重试等待秒数，之后按指数增长
+    TASK_SHUTDOWN_TIMEOUT = 10  # 退出时等待队列排空的最长时间 (秒)
+    
+    # 图片处理工作池配置
+    IMAGE_WORKER_MODE = 'process'  # process / thread / sync
+    IMAGE_WORKER_PROCESSES = 2
+    IMAGE_WORKER_START_METHOD = None  # forkserver / spawn / fork，默认forkserver (不支持时spawn)
+    IMAGE_JOB_FOLDER = None  # 任务状态文件目录 (所有Web进程共享)，默认 UPLOAD_FOLDER/jobs
+    IMAGE_JOB_TTL = 3600  # 任务状态保留时间，未完成的任务超过这个时间视为失败 (秒)
+    IMAGE_VARIANT_WIDTHS = (320, 640, 1024, 1600)  # 响应式图片宽度 (原图宽度总会保留)
+    IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')  # 可加入 avif (需要Pillow支持)
+    BATCH_UPLOAD_MAX_FILES = 20  # 批量上传单次最多文件数
+    BATCH_UPLOAD_WAIT_TIMEOUT = 30  # 批量上传等待图片处理完成的最长时间 (秒)
+    
+    # 上传文件访问配置
+    UPLOAD_SEND_MODE = 'direct'  # direct (werkzeug发送) / x-accel-redirect (Nginx) / x-sendfile (Apache)
+    UPLOAD_ACCEL_REDIRECT_PREFIX = '/protected-uploads/'  # Nginx中指向UPLOAD_FOLDER的internal location
+    UPLOAD_CACHE_MAX_AGE = 31536000  # 内容不可变文件的缓存时间 (秒)
+    
+    # 评论树配置
+    COMMENT_THREAD_MAX_DEPTH = 10  # 最大回复深度 (顶层评论为0)
+    COMMENT_THREAD_MAX_NODES = 500  # 单次最多返回的评论数
     
     # 邮件配置 (可选)
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
@@ -102,6 +157,7 @@ class TestingConfig(Config):
     
     # 测试数据库 (内存数据库)
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    DATABASE_ENGINE_PROFILE = 'testing'
     
     # 测试环境JWT配置
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)
@@ -111,6 +167,18 @@ class TestingConfig(Config):
     
     # 测试环境限流配置
     RATELIMIT_ENABLED = False
+    
+    # 测试环境计数直接写入，便于断言
+    COUNTER_BUFFER_ENABLED = False
+    
+    # 测试环境禁用响应缓存
+    CACHE_TYPE = 'null'
+    
+    # 测试环境令牌撤销记录保存在进程内
+    TOKEN_REVOCATION_BACKEND = 'memory'
+    
+    # 测试环境同步处理图片，上传返回时结果已就绪
+    IMAGE_WORKER_MODE = 'sync'
 
 class ProductionConfig(Config):
     """生产环境配置"""
@@ -120,6 +188,7 @@ class ProductionConfig(Config):
     # 生产环境数据库
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         f'sqlite:///{BASE_DIR}/blog_prod.db'
+    DATABASE_ENGINE_PROFILE = 'production'
     
     # 生产环境安全配置 (在init_app中检查)
     SECRET_KEY = os.environ.get('SECRET_KEY', 'fallback-secret-key')
@@ -174,8 +243,12 @@ class DockerConfig(ProductionConfig):
     
     # Docker环境Redis缓存
     RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL') or 'redis://redis:6379/0'
+    USER_RATELIMIT_BACKEND = 'redis'
+    USER_RATELIMIT_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://redis:6379/0'
     CACHE_TYPE = 'redis'
     CACHE_REDIS_URL = os.environ.get('REDIS_URL') or 'redis://redis:6379/1'
+    TOKEN_REVOCATION_BACKEND = 'redis'
+    TOKEN_REVOCATION_REDIS_URL = 'redis://redis:6379/2'
 
 # 配置字典
 config = {
@@ -5,11 +5,15 @@
 提供JWT认证和权限验证功能
 """
 
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
-from flask import request, current_app
+from flask import request, current_app, g, make_response
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
-from utils.response import unauthorized_response, forbidden_response
+from utils.response import unauthorized_response, forbidden_response, rate_limit_response
 from utils.jwt_helper import JWTHelper, TokenBlacklist
+from utils.rate_limit import rate_limiter
 
 def jwt_required(optional=False):
     """
@@ -38,6 +42,104 @@ def jwt_required(optional=False):
         return wrapper
     return decorator
 
+class PrincipalCache:
+    """
+    用户权限快照缓存 (进程内)
+    
+    缓存 user_id -> (is_admin, is_active)，权限装饰器在有效期内无需查询用户表，
+    修改用户状态后调用 invalidate 立即失效；多进程部署时其他进程最迟在TTL后感知变化。
+    最多保留 max_entries 个用户，超出时淘汰最久未使用的条目
+    """
+    
+    def __init__(self, ttl: int = 30, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user_id -> (过期时间, 权限快照)
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """初始化应用"""
+        self.ttl = app.config.get('AUTH_PRINCIPAL_CACHE_TTL', 30)
+        self.max_entries = app.config.get('AUTH_PRINCIPAL_CACHE_SIZE', 10000)
+        self.clear()
+    
+    def get(self, user_id):
+        """
+        获取用户权限快照
+        
+        Returns:
+            Tuple[bool, bool]: (is_admin, is_active)，用户不存在时返回None
+        """
+        user_id = int(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                return entry[1]
+        
+        # 本次请求已加载过用户对象时直接使用，否则只查询两个权限字段
+        from models import db, User
+        user = g.get('_request_resources', {}).get((User, user_id))
+        if user is not None:
+            principal = (user.is_admin, user.is_active)
+        else:
+            row = db.session.query(User.is_admin, User.is_active).filter(User.id == user_id).first()
+            principal = tuple(row) if row else None
+        
+        if self.ttl and self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl, principal)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return principal
+    
+    def invalidate(self, user_id):
+        """用户权限变更后使缓存失效"""
+        with self._lock:
+            self._entries.pop(int(user_id), None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# 全局实例 (在 app.init_extensions 中初始化)
+principal_cache = PrincipalCache()
+
+def get_request_resource(model, resource_id):
+    """
+    获取模型对象 (请求内缓存)
+    
+    权限装饰器加载过的对象直接交给视图函数复用，同一请求内同一行只查询一次
+    
+    Args:
+        model: 模型类
+        resource_id: 主键
+    
+    Returns:
+        模型对象，不存在时返回None
+    """
+    from models import db
+    resources = g.setdefault('_request_resources', {})
+    key = (model, int(resource_id))
+    if key not in resources:
+        resources[key] = db.session.get(model, key[1])
+    return resources[key]
+
+def get_current_user():
+    """获取当前登录用户对象 (请求内缓存)"""
+    from models import User
+    user_id = get_jwt_identity()
+    return get_request_resource(User, user_id) if user_id else None
+
+def get_current_principal():
+    """获取当前登录用户的 (is_admin, is_active)，未登录或用户不存在时返回None"""
+    if '_current_principal' not in g:
+        user_id = get_jwt_identity()
+        g._current_principal = principal_cache.get(user_id) if user_id else None
+    return g._current_principal
+
 def admin_required(f):
     """
     管理员权限装饰器
@@ -45,11 +147,9 @@ def admin_required(f):
     @wraps(f)
     @jwt_required()
     def wrapper(*args, **kwargs):
-        user_id = get_jwt_identity()
         try:
-            from models import User
-            user = User.query.get(user_id)
-            if not user or not user.is_admin:
+            principal = get_current_principal()
+            if not principal or not principal[0] or not principal[1]:
                 return forbidden_response('需要管理员权限')
         except Exception as e:
             current_app.logger.error(f"Admin check failed: {e}")
@@ -71,29 +171,43 @@ def owner_or_admin_required(get_resource_owner_id):
         def wrapper(*args, **kwargs):
             current_user_id = get_jwt_identity()
             
+            try:
+                principal = get_current_principal()
+            except Exception as e:
+                current_app.logger.error(f"Permission check failed: {e}")
+                return forbidden_response('权限验证失败')
+            
+            # 用户不存在或已被禁用
+            if not principal or not principal[1]:
+                return forbidden_response('权限不足')
+            
             # 获取资源所有者ID
             resource_owner_id = get_resource_owner_id(*args, **kwargs)
             
-            # 检查是否为资源所有者
-            if current_user_id == resource_owner_id:
+            # 检查是否为资源所有者 (JWT身份为字符串，作者ID为整数)
+            if resource_owner_id is not None and str(current_user_id) == str(resource_owner_id):
                 return f(*args, **kwargs)
             
             # 检查是否为管理员
-            try:
-                from models import User
-                user = User.query.get(current_user_id)
-                if user and user.is_admin:
-                    return f(*args, **kwargs)
-            except:
-                pass
+            if principal[0]:
+                return f(*args, **kwargs)
             
             return forbidden_response('权限不足')
         return wrapper
     return decorator
 
-def rate_limit_by_user():
+def rate_limit_by_user(limit='100 per hour', anonymous_limit=None, scope=None, cost=1):
     """
-    基于用户的限流装饰器
+    基于用户的限流装饰器 (令牌桶)
+    
+    登录用户按用户ID计数，匿名请求按IP计数，两者可以使用不同的配额，
+    响应中附带 X-RateLimit-* 头，超出配额返回429和Retry-After
+    
+    Args:
+        limit: 登录用户的配额，如 '60 per minute'，也可以是返回配额字符串的函数
+        anonymous_limit: 匿名请求的配额，为空时与登录用户相同
+        scope: 限流范围，默认为视图的endpoint (每个接口独立计数)
+        cost: 每次请求消耗的令牌数
     """
     def decorator(f):
         @wraps(f)
@@ -107,13 +221,24 @@ def rate_limit_by_user():
                 pass
             
             # 使用IP地址作为备用标识
-            if not user_id:
-                user_id = request.remote_addr
+            if user_id:
+                identity, quota = f'user:{user_id}', limit
+            else:
+                identity, quota = f'ip:{request.remote_addr}', anonymous_limit or limit
+            if callable(quota):
+                quota = quota()
             
-            # 这里可以实现具体的限流逻辑
-            # 例如使用Redis存储用户请求计数
+            result = rate_limiter.hit(f'{scope or request.endpoint}:{identity}', quota, cost)
+            if result is None:
+                return f(*args, **kwargs)
             
-            return f(*args, **kwargs)
+            headers = rate_limiter.headers(result)
+            if not result.allowed:
+                response = make_response(rate_limit_response())
+            else:
+                response = make_response(f(*args, **kwargs))
+            response.headers.extend(headers)
+            return response
         return wrapper
     return decorator
 
@@ -230,7 +355,7 @@ def check_article_permission(article_id):
     """检查文章权限"""
     try:
         from models import Article
-        article = Article.query.get(article_id)
+        article = get_request_resource(Article, article_id)
         return article.author_id if article else None
     except:
         return None
@@ -239,7 +364,7 @@ def check_comment_permission(comment_id):
     """检查评论权限"""
     try:
         from models import Comment
-        comment = Comment.query.get(comment_id)
+        comment = get_request_resource(Comment, comment_id)
         return comment.author_id if comment else None
     except:
         return None
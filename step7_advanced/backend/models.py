@@ -5,10 +5,11 @@ SQLAlchemy数据库模型定义
 将原有的文件存储模型转换为数据库模型
 """
 
+from collections import defaultdict
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table, func, select, event, inspect, text
+from sqlalchemy.orm import relationship, backref, validates
 from sqlalchemy.ext.hybrid import hybrid_property
 from werkzeug.security import generate_password_hash, check_password_hash
 import hashlib
@@ -72,14 +73,21 @@ class User(db.Model):
     last_login = Column(DateTime)
     login_count = Column(Integer, default=0, nullable=False)
     
+    # 反规范化计数器 (在flush时由 _maintain_counters 维护)
+    article_count = Column(Integer, default=0, nullable=False)
+    published_article_count = Column(Integer, default=0, nullable=False)
+    comment_count = Column(Integer, default=0, nullable=False)
+    
     # 关系定义
     articles = relationship('Article', backref='author', lazy='dynamic', cascade='all, delete-orphan')
     comments = relationship('Comment', backref='author', lazy='dynamic', cascade='all, delete-orphan')
+    stats = relationship('UserStats', uselist=False, cascade='all, delete-orphan')
     
     def __init__(self, username, email, password=None):
         """初始化用户"""
         self.username = username
         self.email = email
+        self.stats = UserStats()
         if password:
             self.set_password(password)
     
@@ -98,16 +106,6 @@ class User(db.Model):
         self.login_count += 1
         db.session.commit()
     
-    @hybrid_property
-    def article_count(self):
-        """用户文章数量"""
-        return self.articles.count()
-    
-    @hybrid_property
-    def published_article_count(self):
-        """用户已发布文章数量"""
-        return self.articles.filter_by(is_published=True).count()
-    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -125,6 +123,36 @@ class User(db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+class UserStats(db.Model):
+    """
+    用户统计快照
+    
+    已发布文章的浏览量、点赞数合计，由 _maintain_counters 和计数写缓冲增量维护，
+    可通过 recount_counters (flask recount) 全量重建
+    """
+    __tablename__ = 'user_stats'
+    
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    total_views = Column(Integer, default=0, nullable=False)
+    total_likes = Column(Integer, default=0, nullable=False)
+    
+    def __repr__(self):
+        return f'<UserStats {self.user_id}>'
+
+class RevokedToken(db.Model):
+    """
+    已撤销的JWT (登出)
+    
+    expires_at 为令牌本身的过期时间戳，过期后记录由 revocation_store 定期清理
+    """
+    __tablename__ = 'revoked_tokens'
+    
+    jti = Column(String(64), primary_key=True)
+    expires_at = Column(Integer, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<RevokedToken {self.jti}>'
+
 class Tag(db.Model):
     """标签模型"""
     __tablename__ = 'tags'
@@ -164,6 +192,98 @@ class Tag(db.Model):
     def __repr__(self):
         return f'<Tag {self.name}>'
 
+class TagResolver:
+    """
+    标签名称批量解析
+    
+    一次 IN 查询取出已有标签，缺失的标签用一条 INSERT ... ON CONFLICT DO NOTHING
+    批量创建 (并发创建同名标签时不会因唯一约束失败)，再一次查询取回。
+    进程内缓存 名称→ID，同一会话中已加载的标签直接从identity map取得，不再查询
+    """
+    
+    def __init__(self, max_cache_size=1000):
+        self.max_cache_size = max_cache_size
+        self.last_created = 0  # 最近一次 resolve 新建的标签数
+        self._ids = {}
+    
+    def resolve(self, names):
+        """
+        把标签名称列表解析为Tag对象 (不存在的自动创建)
+        
+        Args:
+            names: 标签名称列表
+        
+        Returns:
+            list: 与去重后的名称顺序一致的Tag列表
+        """
+        self.last_created = 0
+        names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+        if not names:
+            return []
+        
+        session = db.session
+        tags = {}
+        
+        # 解析过程中不触发autoflush，避免把构造中的文章提前写入
+        with session.no_autoflush:
+            for name in names:
+                tag_id = self._ids.get(name)
+                if tag_id is not None:
+                    tag = session.identity_map.get(session.identity_key(Tag, tag_id))
+                    if tag is not None and tag.name == name:
+                        tags[name] = tag
+            
+            missing = [name for name in names if name not in tags]
+            if missing:
+                tags.update(self._load(missing))
+            
+            missing = [name for name in names if name not in tags]
+            if missing:
+                self.last_created = self._insert(missing)
+                tags.update(self._load(missing))
+        
+        return [tags[name] for name in names if name in tags]
+    
+    def _load(self, names):
+        """一次IN查询加载标签"""
+        found = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names)).all()}
+        if len(self._ids) + len(found) > self.max_cache_size:
+            self._ids.clear()
+        self._ids.update((name, tag.id) for name, tag in found.items())
+        return found
+    
+    @staticmethod
+    def _insert(names):
+        """批量插入缺失的标签，已被其他请求创建的标签会被忽略"""
+        table = Tag.__table__
+        dialect = db.session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(table).on_conflict_do_nothing(index_elements=['name'])
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+            stmt = insert(table).on_conflict_do_nothing(index_elements=['name'])
+        elif dialect == 'mysql':
+            stmt = table.insert().prefix_with('IGNORE')
+        else:
+            stmt = table.insert()
+        result = db.session.execute(stmt, [{'name': name} for name in names])
+        return max(result.rowcount, 0)
+    
+    def clear_cache(self):
+        """清空名称缓存"""
+        self._ids.clear()
+
+# 全局标签解析器
+tag_resolver = TagResolver()
+
+# 列表摘要截取的正文长度
+EXCERPT_LENGTH = 200
+
+def make_excerpt(content):
+    """正文开头的摘录 (列表中没有填写摘要时显示)"""
+    return content[:EXCERPT_LENGTH] + '...'
+
 class Article(db.Model):
     """文章模型"""
     __tablename__ = 'articles'
@@ -172,11 +292,13 @@ class Article(db.Model):
     title = Column(String(200), nullable=False, index=True)
     content = Column(Text, nullable=False)
     summary = Column(Text)
+    excerpt = Column(String(EXCERPT_LENGTH + 3))  # 正文摘录 (写入正文时生成，列表查询无需加载正文)
     slug = Column(String(200), unique=True, nullable=False, index=True)
     is_published = Column(Boolean, default=False, nullable=False, index=True)
     featured_image = Column(String(255))
     views = Column(Integer, default=0, nullable=False)
     likes = Column(Integer, default=0, nullable=False)
+    comment_count = Column(Integer, default=0, nullable=False)  # 已审核评论数 (反规范化)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
@@ -194,14 +316,26 @@ class Article(db.Model):
         self.author_id = author_id
         self.slug = self._generate_slug()
         
-        # 添加标签
+        # 添加标签 (批量解析，不逐个查询)
         if tags:
-            for tag_name in tags:
-                tag = Tag.query.filter_by(name=tag_name).first()
-                if not tag:
-                    tag = Tag(name=tag_name)
-                    db.session.add(tag)
-                self.tags.append(tag)
+            self.tags = tag_resolver.resolve(tags)
+    
+    @validates('content')
+    def _update_excerpt(self, key, content):
+        """正文变化时同步更新摘录 (创建和编辑文章都会经过这里)"""
+        self.excerpt = make_excerpt(content)
+        return content
+    
+    @validates('tags', include_removes=True)
+    def _touch_on_tag_change(self, key, tag, is_remove):
+        """标签增删也算内容修改 (只改标签时文章行不是脏的，不会触发updated_at的onupdate)"""
+        # 创建文章时 (__init__ 中赋值标签) 不更新，否则 updated_at 会早于 created_at；
+        # 整体赋值时原有的标签也会触发一次，标签集合没有变化时不更新
+        if not inspect(self).persistent:
+            return tag
+        if is_remove or tag not in self.tags:
+            self.updated_at = datetime.utcnow()
+        return tag
     
     def _generate_slug(self):
         """生成URL友好的slug"""
@@ -234,10 +368,10 @@ class Article(db.Model):
     
     def add_tag(self, tag_name):
         """添加��签"""
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.session.add(tag)
+        tags = tag_resolver.resolve([tag_name])
+        if not tags:
+            return
+        tag = tags[0]
         if tag not in self.tags:
             self.tags.append(tag)
             tag.increment_usage()
@@ -249,11 +383,6 @@ class Article(db.Model):
             self.tags.remove(tag)
             tag.decrement_usage()
     
-    @hybrid_property
-    def comment_count(self):
-        """评论数量"""
-        return self.comments.filter_by(is_approved=True).count()
-    
     @hybrid_property
     def reading_time(self):
         """估算阅读时间（分钟）"""
@@ -305,7 +434,9 @@ class Comment(db.Model):
     id = Column(Integer, primary_key=True)
     content = Column(Text, nullable=False)
     is_approved = Column(Boolean, default=True, nullable=False, index=True)
+    reply_count = Column(Integer, default=0, nullable=False)  # 已审核回复数 (反规范化)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # 外键
     article_id = Column(Integer, ForeignKey('articles.id'), nullable=False, index=True)
@@ -332,11 +463,6 @@ class Comment(db.Model):
         self.is_approved = False
         db.session.commit()
     
-    @hybrid_property
-    def reply_count(self):
-        """回复数量"""
-        return self.replies.filter_by(is_approved=True).count()
-    
     def to_dict(self):
         """转换为字典"""
         return {
@@ -344,6 +470,7 @@ class Comment(db.Model):
             'content': self.content,
             'is_approved': self.is_approved,
             'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'article_id': self.article_id,
             'author': self.author.username if self.author else None,
             'author_id': self.author_id,
@@ -353,3 +480,202 @@ class Comment(db.Model):
     
     def __repr__(self):
         return f'<Comment {self.id} by {self.author.username if self.author else "Unknown"}>'
+
+# 反规范化计数器维护
+def _changed_from(obj, attr):
+    """返回属性在本次flush前的值，未修改时返回None"""
+    history = inspect(obj).attrs[attr].history
+    if not history.has_changes():
+        return None
+    return history.deleted[0] if history.deleted else False
+
+def _previous(obj, attr):
+    """返回属性在本次flush前的值，未修改时返回当前值"""
+    history = inspect(obj).attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(obj, attr)
+
+def _published_totals(published, views, likes):
+    """文章计入作者统计快照的 (浏览量, 点赞数)，未发布文章不计入"""
+    return (views or 0, likes or 0) if published else (0, 0)
+
+@event.listens_for(db.session, 'after_flush')
+def _maintain_counters(session, flush_context):
+    """
+    在flush所在的事务内维护计数器列
+    
+    创建、删除文章/评论，以及发布状态、审核状态变化时，
+    使用 `列 = 列 + 增量` 的UPDATE语句更新计数，与业务数据一起提交或回滚
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    
+    def track_article(article, sign):
+        author = deltas[(User, article.author_id)]
+        author['article_count'] += sign
+        if article.is_published:
+            author['published_article_count'] += sign
+            stats = deltas[(UserStats, article.author_id)]
+            stats['total_views'] += sign * (article.views or 0)
+            stats['total_likes'] += sign * (article.likes or 0)
+    
+    def track_comment(comment, sign, approved_only=False):
+        if not approved_only:
+            deltas[(User, comment.author_id)]['comment_count'] += sign
+        if comment.is_approved or approved_only:
+            deltas[(Article, comment.article_id)]['comment_count'] += sign
+            if comment.parent_id:
+                deltas[(Comment, comment.parent_id)]['reply_count'] += sign
+    
+    for obj in session.new:
+        if isinstance(obj, Article):
+            track_article(obj, 1)
+        elif isinstance(obj, Comment):
+            track_comment(obj, 1)
+    
+    for obj in session.deleted:
+        if isinstance(obj, Article):
+            track_article(obj, -1)
+        elif isinstance(obj, Comment):
+            track_comment(obj, -1)
+    
+    for obj in session.dirty:
+        if isinstance(obj, Article):
+            was_published = _changed_from(obj, 'is_published')
+            if was_published is not None and bool(was_published) != bool(obj.is_published):
+                deltas[(User, obj.author_id)]['published_article_count'] += 1 if obj.is_published else -1
+            
+            # 发布状态或浏览量/点赞数变化时更新作者统计快照
+            old_views, old_likes = _published_totals(
+                _previous(obj, 'is_published'), _previous(obj, 'views'), _previous(obj, 'likes')
+            )
+            new_views, new_likes = _published_totals(obj.is_published, obj.views, obj.likes)
+            stats = deltas[(UserStats, obj.author_id)]
+            stats['total_views'] += new_views - old_views
+            stats['total_likes'] += new_likes - old_likes
+        elif isinstance(obj, Comment):
+            was_approved = _changed_from(obj, 'is_approved')
+            if was_approved is not None and bool(was_approved) != bool(obj.is_approved):
+                track_comment(obj, 1 if obj.is_approved else -1, approved_only=True)
+    
+    connection = session.connection()
+    for (model, pk), columns in deltas.items():
+        values = {name: model.__table__.c[name] + delta for name, delta in columns.items() if delta}
+        if pk is None or not values:
+            continue
+        table = model.__table__
+        if 'updated_at' in table.c:
+            # 计数变化不算内容修改，保留原 updated_at (不触发onupdate)
+            values['updated_at'] = table.c.updated_at
+        pk_column = table.primary_key.columns.values()[0]
+        connection.execute(table.update().where(pk_column == pk).values(values))
+
+def ensure_counter_columns():
+    """
+    为已有数据库补齐反规范化计数列和用户统计表 (db.create_all 不会修改已存在的表)
+    
+    新增的列为 NOT NULL DEFAULT 0，之后由 recount_counters 填充实际值
+    
+    Returns:
+        List[str]: 新增的列 (表名.列名)
+    """
+    counter_columns = {
+        User: ('article_count', 'published_article_count', 'comment_count'),
+        Article: ('comment_count',),
+        Comment: ('reply_count',),
+    }
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as connection:
+        for model, names in counter_columns.items():
+            table = model.__tablename__
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            for name in names:
+                if name in existing:
+                    continue
+                column_type = model.__table__.c[name].type.compile(dialect=db.engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {name} {column_type} NOT NULL DEFAULT 0'))
+                added.append(f'{table}.{name}')
+    UserStats.__table__.create(db.engine, checkfirst=True)
+    return added
+
+def recount_counters():
+    """
+    批量重建所有计数器列
+    
+    每张表只执行一条带关联子查询的UPDATE，用于初始化新增的计数列 (列不存在时先添加)
+    或修复手工改库后的计数偏差；同时补齐缺失的用户统计快照并重新汇总
+    """
+    ensure_counter_columns()
+    users = User.__table__
+    user_stats = UserStats.__table__
+    articles = Article.__table__
+    comments = Comment.__table__
+    replies = comments.alias('replies')
+    
+    db.session.execute(user_stats.insert().from_select(
+        ['user_id'],
+        select(users.c.id).where(users.c.id.not_in(select(user_stats.c.user_id)))
+    ))
+    db.session.execute(user_stats.update().values(
+        total_views=select(func.coalesce(func.sum(articles.c.views), 0))
+            .where(articles.c.author_id == user_stats.c.user_id, articles.c.is_published == True)
+            .scalar_subquery(),
+        total_likes=select(func.coalesce(func.sum(articles.c.likes), 0))
+            .where(articles.c.author_id == user_stats.c.user_id, articles.c.is_published == True)
+            .scalar_subquery()
+    ))
+    
+    db.session.execute(users.update().values(
+        article_count=select(func.count(articles.c.id))
+            .where(articles.c.author_id == users.c.id)
+            .scalar_subquery(),
+        published_article_count=select(func.count(articles.c.id))
+            .where(articles.c.author_id == users.c.id, articles.c.is_published == True)
+            .scalar_subquery(),
+        comment_count=select(func.count(comments.c.id))
+            .where(comments.c.author_id == users.c.id)
+            .scalar_subquery()
+    ))
+    db.session.execute(articles.update().values(
+        comment_count=select(func.count(comments.c.id))
+            .where(comments.c.article_id == articles.c.id, comments.c.is_approved == True)
+            .scalar_subquery(),
+        updated_at=articles.c.updated_at
+    ))
+    db.session.execute(comments.update().values(
+        reply_count=select(func.count(replies.c.id))
+            .where(replies.c.parent_id == comments.c.id, replies.c.is_approved == True)
+            .scalar_subquery(),
+        updated_at=comments.c.updated_at
+    ))
+    db.session.commit()
+
+def ensure_excerpt_column():
+    """
+    为已有数据库的文章表添加 excerpt 列 (db.create_all 不会修改已存在的表)
+    
+    Returns:
+        bool: 是否新增了列
+    """
+    columns = {column['name'] for column in inspect(db.engine).get_columns(Article.__tablename__)}
+    if 'excerpt' in columns:
+        return False
+    column_type = Article.__table__.c.excerpt.type.compile(dialect=db.engine.dialect)
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {Article.__tablename__} ADD COLUMN excerpt {column_type}'))
+    return True
+
+def rebuild_excerpts():
+    """
+    批量重新生成文章摘录
+    
+    一条UPDATE在数据库中截取正文，用于给新增的 excerpt 列填充已有文章 (列不存在时先添加)，
+    或修改 EXCERPT_LENGTH 之后刷新；不更新 updated_at
+    """
+    ensure_excerpt_column()
+    articles = Article.__table__
+    result = db.session.execute(articles.update().values(
+        excerpt=func.substr(articles.c.content, 1, EXCERPT_LENGTH) + '...',
+        updated_at=articles.c.updated_at
+    ))
+    db.session.commit()
+    return result.rowcount
@@ -5,6 +5,7 @@
 
 import requests
 import io
+import time
 from PIL import Image
 
 # API配置
@@ -53,7 +54,21 @@ def test_upload_api():
         print(f"上传状态码: {response.status_code}")
         print(f"上传响应: {response.json()}")
         
-        if response.status_code == 200:
+        # 图片在后台处理，返回202和任务ID，轮询任务状态直到完成
+        if response.status_code == 202:
+            status_url = response.json()['data']['job']['status_url']
+            status = 'pending'
+            for _ in range(20):
+                job = requests.get(f'http://localhost:5000{status_url}', headers=headers).json()['data']
+                status = job['job']['status']
+                if status in ('done', 'failed'):
+                    break
+                time.sleep(0.5)
+            print(f"处理结果: {job}")
+        else:
+            status = 'done' if response.status_code == 200 else 'failed'
+        
+        if status == 'done':
             print("✅ 图片上传测试成功")
         else:
             print("❌ 图片上传测试失败")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应缓存
+为读接口缓存序列化结果，支持TTL、LRU淘汰、可插拔后端，
+以及基于标签 (article:<id>、user:<id>、tag:<name> 等) 的失效
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+from urllib.parse import urlencode
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from models import db, Article, Comment, Tag, User
+from utils.response import is_not_modified, not_modified_response, with_validators
+
+class CacheBackend:
+    """缓存后端接口"""
+
+    def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def get_many(self, keys: List[str]) -> List[Any]:
+        return [self.get(key) for key in keys]
+
+    def get_counters(self, keys: List[str]) -> List[int]:
+        """读取 incr 维护的计数值，不存在时为0"""
+        return [int(value or 0) for value in self.get_many(keys)]
+
+    def set(self, key: str, value: Any, timeout: Optional[int] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+class MemoryCache(CacheBackend):
+    """进程内LRU缓存 (带TTL)"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (过期时间戳或None, 值)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + timeout if timeout else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        with self._lock:
+            expires, value = self._data.get(key, (None, 0))
+            value += 1
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class RedisCache(CacheBackend):
+    """Redis缓存后端 (需要安装 redis 包，多进程共享)"""
+
+    def __init__(self, url: str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return pickle.loads(value) if value is not None else None
+
+    def get_many(self, keys):
+        if not keys:
+            return []
+        return [pickle.loads(value) if value is not None else None for value in self._client.mget(keys)]
+
+    def set(self, key, value, timeout=None):
+        self._client.set(key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+    def get_counters(self, keys):
+        # incr 写入的是原始整数，不经过pickle
+        if not keys:
+            return []
+        return [int(value or 0) for value in self._client.mget(keys)]
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+    def clear(self):
+        self._client.flushdb()
+
+class ResponseCache:
+    """
+    接口响应缓存
+
+    失效策略使用标签版本号：每个标签在后端存一个递增版本，
+    缓存条目记录写入时各标签的版本，读取时版本不一致即视为失效。
+    这样失效只需一次INCR，对多进程共享的后端同样有效
+    """
+
+    TAG_PREFIX = 'tagver:'
+    # 每次失效都会递增的全局版本，用于检查读取数据期间是否发生过失效
+    EPOCH_TAG = '*'
+
+    def __init__(self, app=None):
+        self.backend: Optional[CacheBackend] = None
+        self.default_timeout = 300
+        self.key_prefix = ''
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend: Optional[CacheBackend] = None):
+        """
+        初始化应用
+
+        Args:
+            app: Flask应用
+            backend: 自定义缓存后端，未提供时按 CACHE_TYPE 创建
+        """
+        self.default_timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        self.key_prefix = app.config.get('CACHE_KEY_PREFIX', 'blog:')
+        self.backend = backend or self._create_backend(app)
+        app.extensions['response_cache'] = self
+
+    @staticmethod
+    def _create_backend(app) -> Optional[CacheBackend]:
+        """根据配置创建后端"""
+        cache_type = app.config.get('CACHE_TYPE', 'simple')
+        if cache_type == 'null':
+            return None
+        if cache_type == 'redis':
+            try:
+                return RedisCache(app.config['CACHE_REDIS_URL'])
+            except ImportError:
+                app.logger.warning('未安装redis包，响应缓存回退到进程内缓存')
+        return MemoryCache(app.config.get('CACHE_THRESHOLD', 1000))
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def make_key(self, namespace: str = 'view', exclude: Iterable[str] = ()) -> str:
+        """
+        根据请求路径和规范化后的查询参数生成缓存键
+
+        参数按名称和值排序并忽略空值，?b=2&a=1 与 ?a=1&b=2 命中同一条缓存
+
+        Args:
+            namespace: 键的命名空间
+            exclude: 不影响缓存内容的参数 (如缓存完整数据、返回时再裁剪的 fields)
+        """
+        exclude = set(exclude)
+        args = sorted(
+            (name, value)
+            for name, values in request.args.lists()
+            if name not in exclude
+            for value in values
+            if value != ''
+        )
+        raw = f'{request.path}?{urlencode(args)}'
+        digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        return f'{self.key_prefix}{namespace}:{digest}'
+
+    def _tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(dict.fromkeys(tags))
+        versions = self.backend.get_counters([self.TAG_PREFIX + tag for tag in tags])
+        return dict(zip(tags, versions))
+
+    def get(self, key: str) -> Any:
+        """读取缓存，标签已失效时返回None"""
+        if not self.enabled:
+            return None
+
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+
+        value, tag_versions = entry
+        if tag_versions and self._tag_versions(tag_versions) != tag_versions:
+            return None
+        return value
+
+    def snapshot(self, tags: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        在读取数据之前记录标签版本，写入缓存时传给 set(versions=...)
+
+        写入时才读取版本的话，读取数据之后、写入之前提交的修改会被新版本号掩盖，
+        旧数据就会以新版本缓存下来
+        """
+        if not self.enabled:
+            return {}
+        return self._tag_versions([self.EPOCH_TAG, *tags])
+
+    def set(self, key: str, value: Any, tags: Iterable[str] = (), timeout: Optional[int] = None,
+            versions: Optional[Dict[str, int]] = None):
+        """
+        写入缓存并记录标签版本
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            tags: 标签列表
+            timeout: 过期时间 (秒)
+            versions: 读取数据之前 snapshot() 记录的版本，未提供时使用当前版本
+        """
+        if not self.enabled:
+            return
+        tags = [tag for tag in dict.fromkeys(tags) if tag != self.EPOCH_TAG]
+        if versions is None:
+            tag_versions = self._tag_versions(tags)
+        else:
+            tag_versions = {tag: versions[tag] for tag in tags if tag in versions}
+            late_tags = [tag for tag in tags if tag not in versions]
+            if late_tags:
+                # 根据数据才能确定的标签只能读取当前版本 (先读标签再读全局版本，与 invalidate 的顺序相反)，
+                # 期间发生过任何失效就不写入
+                tag_versions.update(self._tag_versions(late_tags))
+                if self._tag_versions([self.EPOCH_TAG])[self.EPOCH_TAG] != versions.get(self.EPOCH_TAG):
+                    return
+        self.backend.set(key, (value, tag_versions), timeout or self.default_timeout)
+
+    def invalidate(self, *tags: str):
+        """使带有任一标签的缓存失效"""
+        if not self.enabled:
+            return
+        tags = [tag for tag in dict.fromkeys(tags) if tag]
+        if not tags:
+            return
+        self.backend.incr(self.TAG_PREFIX + self.EPOCH_TAG)
+        for tag in tags:
+            self.backend.incr(self.TAG_PREFIX + tag)
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+
+    def cached(self, tags: Union[Iterable[str], Callable[..., Iterable[str]]] = (),
+               timeout: Optional[int] = None, anonymous_only: bool = False):
+        """
+        缓存GET接口的200响应 (连同ETag/Last-Modified，命中时同样支持304)
+
+        Args:
+            tags: 标签列表，或 callable(响应JSON, **视图参数) 返回标签列表
+            timeout: 过期时间 (秒)
+            anonymous_only: 为True时带Authorization头的请求不走缓存
+        """
+        def decorator(f):
+            @wraps(f)
+            def wrapper(*args, **kwargs):
+                if (not self.enabled or request.method != 'GET'
+                        or (anonymous_only and 'Authorization' in request.headers)):
+                    return f(*args, **kwargs)
+
+                key = self.make_key()
+                cached_response = self.get(key)
+                if cached_response is not None:
+                    body, status, mimetype, etag, weak, last_modified = cached_response
+                    if etag and is_not_modified(etag, last_modified):
+                        return not_modified_response(etag, last_modified, weak)
+                    response = current_app.response_class(body, status=status, mimetype=mimetype)
+                    if etag:
+                        response = with_validators(response, etag, last_modified, weak)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                versions = self.snapshot(() if callable(tags) else tags)
+                response = current_app.make_response(f(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    entry_tags = tags(response.get_json(silent=True) or {}, **kwargs) if callable(tags) else tags
+                    etag, weak = response.get_etag()
+                    self.set(key, (response.get_data(), response.status_code, response.mimetype,
+                                   etag, weak, response.last_modified), entry_tags, timeout, versions)
+                    response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+# 全局实例 (在 app.init_extensions 中初始化)
+response_cache = ResponseCache()
+
+def model_cache_tags(obj) -> List[str]:
+    """模型对象变更时需要失效的缓存标签"""
+    if isinstance(obj, Article):
+        return ['articles', f'article:{obj.id}', f'user:{obj.author_id}']
+    if isinstance(obj, Comment):
+        return ['comments', f'comment:{obj.id}', f'article:{obj.article_id}', f'user:{obj.author_id}']
+    if isinstance(obj, User):
+        return [f'user:{obj.id}']
+    if isinstance(obj, Tag):
+        return ['articles', f'tag:{obj.name}']
+    return []
+
+@event.listens_for(db.session, 'after_flush')
+def _collect_cache_tags(session, flush_context):
+    """收集本次事务中变更对象对应的缓存标签"""
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        tags.update(model_cache_tags(obj))
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_cache_tags(session):
+    """事务提交后再失效缓存，避免其他请求在提交前重新缓存旧数据"""
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        response_cache.invalidate(*tags)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _discard_cache_tags(session, previous_transaction):
+    session.info.pop('cache_tags', None)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评论树加载
+用一条递归CTE取出整个评论线程 (按层级广度优先，受深度和数量限制)，
+作者信息一次批量查询，再在Python中以O(n)组装成嵌套结构
+"""
+
+from functools import cached_property
+from typing import Dict, List, Optional
+
+from sqlalchemy import literal, select
+
+from models import db, Comment, User
+
+class CommentThread:
+    """评论线程 (扁平行 + 组装后的树)"""
+
+    def __init__(self, rows: List, truncated: bool):
+        self.rows = rows
+        self.truncated = truncated
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    def to_tree(self) -> List[Dict]:
+        """
+        组装嵌套结构
+
+        行按深度排序，父节点总是先于子节点出现，一次遍历即可完成
+        """
+        authors = self.authors
+        nodes = {}
+        roots = []
+
+        for row in self.rows:
+            author = authors.get(row.author_id)
+            node = {
+                'id': row.id,
+                'content': row.content,
+                'created_at': row.created_at.isoformat(),
+                'author': {
+                    'id': row.author_id,
+                    'username': author
+                },
+                'parent_id': row.parent_id,
+                'depth': row.depth,
+                'replies_count': row.reply_count,
+                'replies': []
+            }
+            nodes[row.id] = node
+
+            parent = nodes.get(row.parent_id) if row.depth > 0 else None
+            if parent is not None:
+                parent['replies'].append(node)
+            else:
+                roots.append(node)
+
+        return roots
+
+    @cached_property
+    def authors(self) -> Dict[int, str]:
+        """作者ID -> 用户名 (一次查询加载，生成ETag和组装时共用)"""
+        author_ids = {row.author_id for row in self.rows}
+        if not author_ids:
+            return {}
+        return dict(
+            db.session.query(User.id, User.username)
+            .filter(User.id.in_(author_ids))
+            .all()
+        )
+
+def load_comment_thread(article_id: Optional[int] = None, root_id: Optional[int] = None,
+                        max_depth: int = 10, max_nodes: int = 500) -> CommentThread:
+    """
+    加载评论线程
+
+    Args:
+        article_id: 加载文章下的全部评论 (从顶层评论开始)
+        root_id: 加载某条评论及其所有回复
+        max_depth: 最大回复深度 (顶层为0)
+        max_nodes: 最多返回的评论数
+
+    Returns:
+        CommentThread: 评论线程
+    """
+    comments = Comment.__table__
+    columns = [
+        comments.c.id, comments.c.content, comments.c.created_at, comments.c.updated_at,
+        comments.c.author_id, comments.c.parent_id, comments.c.reply_count
+    ]
+
+    anchor = select(*columns, literal(0).label('depth'))\
+        .where(comments.c.is_approved == True)
+    if root_id is not None:
+        anchor = anchor.where(comments.c.id == root_id)
+    else:
+        anchor = anchor.where(comments.c.article_id == article_id, comments.c.parent_id.is_(None))
+
+    thread = anchor.cte('comment_thread', recursive=True)
+    child = comments.alias('child')
+    thread = thread.union_all(
+        select(*[child.c[column.name] for column in columns], (thread.c.depth + 1).label('depth'))
+        .where(
+            child.c.parent_id == thread.c.id,
+            child.c.is_approved == True,
+            thread.c.depth < max_depth
+        )
+    )
+
+    # 按层级排序后截断，保证被截掉的只会是最深处的评论，不会出现缺少父节点的回复
+    rows = db.session.execute(
+        select(thread)
+        .order_by(thread.c.depth, thread.c.created_at, thread.c.id)
+        .limit(max_nodes + 1)
+    ).all()
+
+    return CommentThread(rows[:max_nodes], truncated=len(rows) > max_nodes)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+浏览量/点赞数写缓冲
+在进程内累积计数增量，定时或达到阈值后用一条批量UPDATE写回数据库，
+避免每次阅读、点赞都单独提交一个写事务
+"""
+
+import atexit
+import threading
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from sqlalchemy import bindparam, select
+
+from models import db, Article, UserStats
+from utils.cache import response_cache
+
+VIEWS = 0
+LIKES = 1
+
+class CounterBuffer:
+    """计数写缓冲 (write-behind)"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.interval = 5
+        self.threshold = 500
+
+        self._lock = threading.Lock()
+        self._pending: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+        self._pending_total = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """初始化应用"""
+        self.app = app
+        self.enabled = app.config.get('COUNTER_BUFFER_ENABLED', True)
+        self.interval = app.config.get('COUNTER_FLUSH_INTERVAL', 5)
+        self.threshold = app.config.get('COUNTER_FLUSH_THRESHOLD', 500)
+        app.extensions['counter_buffer'] = self
+
+        if self.enabled:
+            self._start()
+            atexit.register(self.shutdown)
+
+    def _start(self):
+        """启动后台定时刷新线程"""
+        if self._thread is not None or not self.interval or self.interval <= 0:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='counter-buffer-flush', daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        """定时刷新循环"""
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def record_view(self, article_id: int) -> int:
+        """
+        记录一次浏览
+
+        Returns:
+            int: 数据库中尚未包含的浏览增量 (读取到的浏览量加上它即为当前值)
+        """
+        return self._record(article_id, VIEWS)
+
+    def record_like(self, article_id: int) -> int:
+        """
+        记录一次点赞
+
+        Returns:
+            int: 数据库中尚未包含的点赞增量
+        """
+        return self._record(article_id, LIKES)
+
+    def _record(self, article_id, index):
+        """累积增量；未启用缓冲时退回到直接提交"""
+        if not self.enabled:
+            counts = [0, 0]
+            counts[index] = 1
+            params = self._params({article_id: counts})
+            for stmt in self._statements():
+                db.session.execute(stmt, params)
+            author_ids = self._author_ids(db.session, [article_id])
+            db.session.commit()
+            self._invalidate([article_id], author_ids)
+            return 1
+
+        with self._lock:
+            counts = self._pending[article_id]
+            counts[index] += 1
+            delta = counts[index]
+            self._pending_total += 1
+            should_flush = self._pending_total >= self.threshold
+
+        if should_flush:
+            self.flush()
+        return delta
+
+    def pending(self, article_id: int) -> Tuple[int, int]:
+        """获取尚未写回的增量 (views, likes)"""
+        with self._lock:
+            counts = self._pending.get(article_id)
+            return (counts[VIEWS], counts[LIKES]) if counts else (0, 0)
+
+    def flush(self) -> int:
+        """
+        将缓冲的增量写回数据库
+
+        Returns:
+            int: 本次写回的文章数量
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = defaultdict(lambda: [0, 0])
+            self._pending_total = 0
+
+        try:
+            self._write(batch)
+        except Exception as e:
+            # 写入失败时把增量合并回缓冲区，等待下次重试
+            with self._lock:
+                for article_id, (views, likes) in batch.items():
+                    counts = self._pending[article_id]
+                    counts[VIEWS] += views
+                    counts[LIKES] += likes
+                    self._pending_total += views + likes
+            self.app.logger.error(f'计数缓冲写回失败: {e}')
+            return 0
+
+        return len(batch)
+
+    @staticmethod
+    def _statements():
+        """
+        写回语句 (不改变文章的 updated_at)
+
+        1. UPDATE articles SET views = views + :d ...
+        2. 已发布文章的增量同时累加到作者的统计快照
+        """
+        articles = Article.__table__
+        stats = UserStats.__table__
+        author_id = select(articles.c.author_id)\
+            .where(articles.c.id == bindparam('b_id'), articles.c.is_published == True)\
+            .scalar_subquery()
+        return [
+            articles.update()
+                .where(articles.c.id == bindparam('b_id'))
+                .values(
+                    views=articles.c.views + bindparam('b_views'),
+                    likes=articles.c.likes + bindparam('b_likes'),
+                    updated_at=articles.c.updated_at
+                ),
+            stats.update()
+                .where(stats.c.user_id == author_id)
+                .values(
+                    total_views=stats.c.total_views + bindparam('b_views'),
+                    total_likes=stats.c.total_likes + bindparam('b_likes')
+                )
+        ]
+
+    @staticmethod
+    def _params(batch):
+        return [
+            {'b_id': article_id, 'b_views': views, 'b_likes': likes}
+            for article_id, (views, likes) in batch.items()
+        ]
+
+    def _write(self, batch):
+        """在一个事务中用 executemany 的UPDATE写回"""
+        params = self._params(batch)
+        with self.app.app_context():
+            with db.engine.begin() as connection:
+                for stmt in self._statements():
+                    connection.execute(stmt, params)
+                author_ids = self._author_ids(connection, batch.keys())
+        self._invalidate(batch.keys(), author_ids)
+
+    @staticmethod
+    def _author_ids(connection, article_ids) -> List[int]:
+        """文章的作者 (作者主页的统计和近期文章浏览量也随写回变化)"""
+        articles = Article.__table__
+        return connection.execute(
+            select(articles.c.author_id).distinct().where(articles.c.id.in_(list(article_ids)))
+        ).scalars().all()
+
+    @staticmethod
+    def _invalidate(article_ids, author_ids=()):
+        """写回后使文章详情和作者主页的缓存失效 (列表缓存按TTL过期)"""
+        response_cache.invalidate(
+            *(f'views:{article_id}' for article_id in article_ids),
+            *(f'user:{author_id}' for author_id in author_ids)
+        )
+
+    def shutdown(self):
+        """停止后台线程并写回剩余增量"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+        self.flush()
+
+# 全局实例 (在 app.init_extensions 中初始化)
+counter_buffer = CounterBuffer()
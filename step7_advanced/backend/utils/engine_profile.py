@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库引擎配置档
+按配置类选择一组引擎参数 (DATABASE_ENGINE_PROFILE)：
+SQLite在每个新连接上执行PRAGMA (WAL、synchronous=NORMAL、mmap、页缓存、busy_timeout、临时表放内存)，
+读写可以并发进行，写锁冲突时等待而不是立即报 database is locked；
+PostgreSQL/MySQL等服务器数据库使用连接池大小、溢出、回收和预检参数；
+两者都设置SQLAlchemy的编译语句缓存大小
+"""
+
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+MB = 1024 * 1024
+
+# 配置档: sqlite.pragmas 在连接建立时执行，sqlite.cached_statements 为驱动层预编译语句缓存数；
+# server 为服务器数据库的连接池参数；query_cache_size 为SQLAlchemy编译缓存的条目数
+ENGINE_PROFILES: Dict[str, Dict[str, Any]] = {
+    'development': {
+        'sqlite': {
+            'pragmas': {
+                'journal_mode': 'WAL',  # 读不阻塞写，写不阻塞读 (数据库文件不能放在网络文件系统上)
+                'synchronous': 'NORMAL',  # WAL模式下只在检查点时fsync，掉电最多丢失最近的事务
+                'busy_timeout': 5000,  # 写锁被占用时最多等待的毫秒数
+                'cache_size': -16000,  # 负数单位为KiB，约16MB页缓存
+                'temp_store': 'MEMORY',
+                'mmap_size': 64 * MB,
+            },
+            'cached_statements': 128,
+        },
+        'server': {
+            'pool_size': 5,
+            'max_overflow': 5,
+            'pool_timeout': 30,
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        },
+        'query_cache_size': 500,
+    },
+    'testing': {
+        # 内存数据库不支持WAL，也不需要持久化
+        'sqlite': {
+            'pragmas': {
+                'synchronous': 'OFF',
+                'temp_store': 'MEMORY',
+            },
+        },
+        'server': {
+            'pool_size': 2,
+            'max_overflow': 0,
+            'pool_pre_ping': True,
+        },
+        'query_cache_size': 500,
+    },
+    'production': {
+        'sqlite': {
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 10000,
+                'cache_size': -64000,
+                'temp_store': 'MEMORY',
+                'mmap_size': 256 * MB,
+            },
+            'cached_statements': 256,
+        },
+        'server': {
+            'pool_size': 10,  # 每个worker进程常驻连接数
+            'max_overflow': 20,  # 高峰时额外创建的连接数
+            'pool_timeout': 10,  # 连接池耗尽时等待的秒数
+            'pool_recycle': 1800,
+            'pool_pre_ping': True,
+        },
+        'query_cache_size': 1200,
+    },
+}
+
+def is_sqlite(uri) -> bool:
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+def get_profile(name: str) -> Dict[str, Any]:
+    """
+    按名称获取配置档
+
+    Raises:
+        ValueError: 配置档不存在
+    """
+    try:
+        return ENGINE_PROFILES[name]
+    except KeyError:
+        raise ValueError(f'未知的数据库引擎配置档: {name}，可选: {", ".join(ENGINE_PROFILES)}')
+
+def build_engine_options(uri, profile: Dict[str, Any], overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    生成传给 create_engine 的参数
+
+    SQLite (Flask-SQLAlchemy 对内存数据库使用 StaticPool) 不设置连接池参数，
+    也不做连接预检：本地文件连接不会失效，预检只会给每次取连接多一条查询
+
+    Args:
+        uri: 数据库连接字符串
+        profile: 配置档
+        overrides: SQLALCHEMY_ENGINE_OPTIONS 中显式配置的参数，优先级最高
+    """
+    options: Dict[str, Any] = {'query_cache_size': profile.get('query_cache_size', 500)}
+    if is_sqlite(uri):
+        cached_statements = profile.get('sqlite', {}).get('cached_statements')
+        if cached_statements:
+            options['connect_args'] = {'cached_statements': cached_statements}
+    else:
+        options.update(profile.get('server', {}))
+    options.update(overrides or {})
+    return options
+
+def register_sqlite_pragmas(engine, pragmas: Dict[str, Any]):
+    """在SQLite引擎的每个新连接上执行PRAGMA"""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+    @event.listens_for(engine, 'connect')
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+def init_database(app, db):
+    """
+    按配置档初始化数据库 (代替 db.init_app)
+
+    Args:
+        app: Flask应用
+        db: Flask-SQLAlchemy实例
+    """
+    profile = get_profile(app.config.get('DATABASE_ENGINE_PROFILE', 'development'))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'], profile, app.config.get('SQLALCHEMY_ENGINE_OPTIONS')
+    )
+    db.init_app(app)
+
+    # 引擎在 init_app 中创建，连接在第一次使用时才建立
+    with app.app_context():
+        register_sqlite_pragmas(db.engine, profile.get('sqlite', {}).get('pragmas'))
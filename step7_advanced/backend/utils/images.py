@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片处理工作池
+Pillow的解码、缩放和JPEG编码是CPU密集型操作，放在请求线程里会占住GIL；
+上传接口只保存原始文件并提交任务，由进程池生成多尺寸、多格式的响应式变体，
+客户端通过任务ID轮询结果 (任务状态写在共享的任务目录中)；输出文件按内容的SHA-256寻址，相同图片只处理和存储一次
+"""
+
+import atexit
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_all_start_methods, get_context
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+def flatten_image(img: Image.Image) -> Image.Image:
+    """透明图片铺白色背景并转为RGB (JPEG不支持透明通道)"""
+    if img.mode in ('RGBA', 'LA', 'P'):
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+        return background
+    if img.mode != 'RGB':
+        return img.convert('RGB')
+    return img
+
+# 输出格式 -> (文件扩展名, MIME类型, 保存参数)
+VARIANT_FORMATS = {
+    'jpeg': ('jpg', 'image/jpeg', {'optimize': True, 'progressive': True}),
+    'webp': ('webp', 'image/webp', {'method': 4}),
+    'avif': ('avif', 'image/avif', {'speed': 8}),
+}
+
+# 部分Python版本的mimetypes不认识这些扩展名，文件服务按扩展名推断Content-Type
+for _extension, _mime_type, _ in VARIANT_FORMATS.values():
+    mimetypes.add_type(_mime_type, f'.{_extension}')
+
+def supported_formats(formats: Iterable[str]) -> List[str]:
+    """过滤出当前Pillow能够编码的输出格式 (AVIF需要Pillow编译时带libavif)"""
+    Image.init()
+    return [fmt for fmt in formats if fmt in VARIANT_FORMATS and fmt.upper() in Image.SAVE]
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def manifest_path(dest_dir: str, digest: str) -> str:
+    return os.path.join(dest_dir, f'{digest}.json')
+
+def load_manifest(dest_dir: str, digest: str) -> Optional[Dict[str, Any]]:
+    """读取已生成的变体清单，不存在时返回None"""
+    try:
+        with open(manifest_path(dest_dir, digest), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_atomic(img: Image.Image, path: str, fmt: str, quality: int) -> int:
+    """先写临时文件再重命名，相同内容并发处理时不会读到写了一半的文件"""
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        img.save(tmp_path, fmt.upper(), quality=quality, **VARIANT_FORMATS[fmt][2])
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(path)
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    """先写临时文件再重命名，读取方不会读到写了一半的JSON"""
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def render_variants(source_path: str, dest_dir: str, digest: str,
+                    widths: Iterable[int] = (320, 640, 1024, 1600),
+                    formats: Iterable[str] = ('webp', 'jpeg'),
+                    max_size: Tuple[int, int] = (1920, 1080),
+                    thumbnail_size: Optional[Tuple[int, int]] = None,
+                    quality: int = 85) -> Dict[str, Any]:
+    """
+    生成响应式图片变体 (在工作进程中执行)
+
+    原图只解码一次：先缩放到 max_size 以内，再从大到小依次缩小得到各个宽度，
+    每个宽度按 formats 各编码一份；文件以内容的SHA-256命名，清单最后写入，
+    清单存在即表示该内容已处理完成，重复上传可以直接复用。
+    失败时不删除已写入的变体：同名文件可能属于同一内容的其他任务 (或已有的清单)，
+    临时文件由 _save_atomic 自行清理，缺少清单的变体会在下次上传时重新生成并覆盖
+
+    Args:
+        source_path: 原始上传文件 (处理后删除)
+        dest_dir: 输出目录
+        digest: 原始文件的SHA-256
+        widths: 目标宽度 (大于原图的宽度会被跳过，原图宽度总会保留)
+        formats: 输出格式，如 webp / jpeg / avif
+        max_size: 最大尺寸
+        thumbnail_size: 缩略图尺寸，为空时不生成
+        quality: 编码质量
+
+    Returns:
+        Dict: 变体清单
+    """
+    formats = supported_formats(formats)
+    try:
+        with Image.open(source_path) as source:
+            # draft 让JPEG解码器直接按接近目标的比例解码，大图可省去大部分解码工作
+            source.draft('RGB', max_size)
+            img = flatten_image(source)
+            img.load()  # 无需转换时img就是source本身，要在文件关闭前读入像素
+            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+        targets = sorted({w for w in widths if w < img.width} | {img.width}, reverse=True)
+        variants = []
+        current = img
+        for width in targets:
+            if width != current.width:
+                height = max(1, round(current.height * width / current.width))
+                current = current.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                extension, mime_type, _ = VARIANT_FORMATS[fmt]
+                name = f'{digest}_{width}.{extension}'
+                path = os.path.join(dest_dir, name)
+                variants.append({
+                    'name': name,
+                    'format': fmt,
+                    'mime_type': mime_type,
+                    'width': current.width,
+                    'height': current.height,
+                    'size': _save_atomic(current, path, fmt, quality)
+                })
+
+        thumbnail = None
+        if thumbnail_size:
+            thumb = current.copy()
+            thumb.thumbnail(thumbnail_size, Image.Resampling.LANCZOS)
+            name = f'{digest}_thumb.jpg'
+            path = os.path.join(dest_dir, name)
+            thumbnail = {
+                'name': name,
+                'width': thumb.width,
+                'height': thumb.height,
+                'size': _save_atomic(thumb, path, 'jpeg', quality)
+            }
+
+        manifest = {
+            'sha256': digest,
+            'width': img.width,
+            'height': img.height,
+            'formats': formats,
+            'variants': variants,
+            'thumbnail': thumbnail
+        }
+        _write_json_atomic(manifest_path(dest_dir, digest), manifest)
+        return manifest
+    finally:
+        if os.path.exists(source_path):
+            os.remove(source_path)
+
+def _run_job(job_path: str, func: Callable, args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """在工作进程中执行任务，并把状态写入任务文件 (各个Web进程都能读到)"""
+    with open(job_path, encoding='utf-8') as f:
+        job = json.load(f)
+    _write_json_atomic(job_path, dict(job, status='processing'))
+    try:
+        result = func(*args, **kwargs)
+    except Exception as e:
+        _write_json_atomic(job_path, dict(job, status='failed', error=str(e), finished_at=time.time()))
+        raise
+    _write_json_atomic(job_path, dict(job, status='done', result=result, finished_at=time.time()))
+    return result
+
+def default_start_method() -> str:
+    """
+    进程池的默认启动方式
+
+    Web进程里已经运行着计数缓冲、任务队列、撤销同步等后台线程，fork出的子进程会继承其中被持有的锁；
+    forkserver / spawn 从干净的进程启动工作进程
+    """
+    return 'forkserver' if 'forkserver' in get_all_start_methods() else 'spawn'
+
+class ImageWorker:
+    """
+    图片处理工作池
+
+    模式 (IMAGE_WORKER_MODE):
+        process: 进程池执行，不受GIL限制 (默认)
+        thread: 线程池执行 (无法使用多进程的环境)
+        sync: 提交时立即在当前线程执行 (测试用)
+
+    任务状态保存在 IMAGE_JOB_FOLDER 下的JSON文件中 (由执行任务的工作进程更新)，
+    提交任务的进程之外的Web进程也能查询；超过 IMAGE_JOB_TTL 秒的任务文件在后续提交时清理，
+    超时仍未完成的任务 (如工作进程被杀死) 视为失败
+    """
+
+    SWEEP_INTERVAL = 300  # 清理过期任务文件的最小间隔 (秒)
+
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = 'process'
+        self.workers = 2
+        self.job_ttl = 3600
+        self.job_folder = None
+        self.start_method = None
+
+        self._executor = None
+        self._futures: Dict[str, Future] = {}  # 本进程提交、尚未完成的任务 (供 wait 使用)
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """初始化应用 (进程池在第一次提交任务时创建)"""
+        self.shutdown()
+
+        self.app = app
+        self.mode = app.config.get('IMAGE_WORKER_MODE', 'process')
+        self.workers = max(1, app.config.get('IMAGE_WORKER_PROCESSES', 2))
+        self.job_ttl = app.config.get('IMAGE_JOB_TTL', 3600)
+        self.job_folder = str(
+            app.config.get('IMAGE_JOB_FOLDER')
+            or os.path.join(app.config.get('UPLOAD_FOLDER', 'uploads'), 'jobs')
+        )
+        self.start_method = app.config.get('IMAGE_WORKER_START_METHOD') or default_start_method()
+        os.makedirs(self.job_folder, exist_ok=True)
+        app.extensions['image_worker'] = self
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.mode == 'process':
+                context = get_context(self.start_method)
+                if self.start_method == 'forkserver':
+                    # 在forkserver进程中预先导入图片处理模块 (Pillow)，新的工作进程直接继承
+                    context.set_forkserver_preload([__name__])
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='image-worker')
+        return self._executor
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.job_folder, f'{job_id}.json')
+
+    def submit(self, func: Callable, *args, meta: Optional[Dict] = None, **kwargs) -> str:
+        """
+        提交图片处理任务
+
+        Args:
+            func: 模块级函数 (进程池需要能够pickle)，返回值需要能编码为JSON
+            *args: 位置参数
+            meta: 随任务保存的附加信息 (需要能编码为JSON)，查询状态时原样返回
+            **kwargs: 关键字参数
+
+        Returns:
+            str: 任务ID
+        """
+        self._sweep_expired()
+
+        job_id = uuid.uuid4().hex
+        job_path = self._job_path(job_id)
+        _write_json_atomic(job_path, {
+            'job_id': job_id, 'status': 'pending', 'meta': meta or {}, 'created_at': time.time()
+        })
+
+        if self.mode == 'sync':
+            future = Future()
+            try:
+                future.set_result(_run_job(job_path, func, args, kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = self._get_executor().submit(_run_job, job_path, func, args, kwargs)
+
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._finished(job_id, f))
+        return job_id
+
+    def _finished(self, job_id: str, future: Future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        error = future.exception()
+        if error is not None and self.app is not None:
+            self.app.logger.error(f'图片处理任务 {job_id} 失败: {error}')
+
+    def _sweep_expired(self):
+        """删除超过保留时间的任务文件 (最多每 SWEEP_INTERVAL 秒扫描一次目录)"""
+        now = time.time()
+        if now - self._last_sweep < self.SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        try:
+            with os.scandir(self.job_folder) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json') and now - entry.stat().st_mtime > self.job_ttl:
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+    def wait(self, job_ids: Iterable[str], timeout: Optional[float] = None) -> bool:
+        """
+        等待本进程提交的一组任务完成
+
+        Returns:
+            bool: 是否全部在超时前完成
+        """
+        with self._lock:
+            futures = [self._futures[job_id] for job_id in job_ids if job_id in self._futures]
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        查询任务状态
+
+        Returns:
+            Dict: {'job_id', 'status', 'result', 'error', 'meta'}，任务不存在时返回None
+            status 为 pending / processing / done / failed
+        """
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        try:
+            with open(self._job_path(job_id), encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        status, error = job['status'], job.get('error')
+        if status in ('pending', 'processing') and time.time() - job['created_at'] > self.job_ttl:
+            status, error = 'failed', '任务超时'
+
+        return {
+            'job_id': job_id,
+            'status': status,
+            'result': job.get('result'),
+            'error': error,
+            'meta': job['meta']
+        }
+
+    def shutdown(self, wait: bool = True):
+        """关闭工作池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+# 全局实例 (在 app.init_extensions 中初始化)
+image_worker = ImageWorker()
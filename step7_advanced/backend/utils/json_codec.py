@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON序列化后端
+API响应统一经过这里编码为UTF-8字节串：安装了orjson时使用orjson，否则使用标准库json；
+datetime / date / UUID / Decimal 直接编码，视图不必逐个调用 isoformat()
+"""
+
+import json
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Optional
+
+from flask import current_app
+
+def _default(value: Any) -> Any:
+    """两个后端共用的扩展类型转换"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f'无法序列化为JSON的类型: {type(value).__name__}')
+
+class JSONBackend:
+    """序列化后端接口"""
+
+    name = ''
+
+    def dumps(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+class StdlibJSONBackend(JSONBackend):
+    """标准库json (紧凑格式，不转义非ASCII字符)"""
+
+    name = 'json'
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_default)
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj).encode('utf-8')
+
+class OrjsonBackend(JSONBackend):
+    """
+    orjson (需要安装 orjson 包)
+
+    datetime / UUID 由orjson原生编码，格式与 isoformat() 一致；
+    orjson不支持的值 (如超过64位的整数) 回退到标准库
+    """
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        self._option = orjson.OPT_NON_STR_KEYS
+        self._fallback = StdlibJSONBackend()
+
+    def dumps(self, obj):
+        try:
+            return self._orjson.dumps(obj, default=_default, option=self._option)
+        except self._orjson.JSONEncodeError:
+            return self._fallback.dumps(obj)
+
+def create_backend(name: str = 'auto') -> JSONBackend:
+    """
+    按名称创建后端
+
+    Args:
+        name: auto (安装了orjson时使用orjson) / orjson / json
+
+    Raises:
+        ImportError: 指定了orjson但未安装
+    """
+    if name == 'json':
+        return StdlibJSONBackend()
+    try:
+        return OrjsonBackend()
+    except ImportError:
+        if name == 'orjson':
+            raise
+        return StdlibJSONBackend()
+
+class JSONCodec:
+    """JSON编码器 (未初始化应用时按 auto 选择后端)"""
+
+    def __init__(self, app=None):
+        self.backend: JSONBackend = create_backend()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """初始化应用"""
+        name = app.config.get('JSON_BACKEND', 'auto')
+        try:
+            self.backend = create_backend(name)
+        except ImportError:
+            app.logger.warning('未安装orjson包，JSON序列化回退到标准库')
+            self.backend = StdlibJSONBackend()
+        app.extensions['json_codec'] = self
+
+    def dumps(self, obj: Any) -> bytes:
+        """编码为UTF-8字节串"""
+        return self.backend.dumps(obj)
+
+    def response(self, obj: Any, status: Optional[int] = None):
+        """
+        创建JSON响应 (需要应用上下文)
+
+        Args:
+            obj: 响应数据
+            status: HTTP状态码
+
+        Returns:
+            Response: 以字节串为响应体的响应对象
+        """
+        return current_app.response_class(self.dumps(obj), status=status, mimetype='application/json')
+
+# 全局实例 (在 app.init_extensions 中初始化)
+json_codec = JSONCodec()
@@ -11,6 +11,8 @@ from datetime import datetime, timedelta
 from typing import Dict, Optional, Any
 import jwt
 
+from utils.revocation import revocation_store
+
 class JWTHelper:
     """JWT工具类"""
     
@@ -270,25 +272,27 @@ class JWTHelper:
             'email': email
         }
 
-# 黑名单管理 (简单实现，生产环境建议使用Redis)
+# 黑名单管理 (委托给 utils.revocation 中的撤销存储)
 class TokenBlacklist:
     """令牌黑名单管理"""
     
-    _blacklist = set()
-    
     @classmethod
-    def add_token(cls, jti: str):
-        """添加令牌到黑名单"""
-        cls._blacklist.add(jti)
+    def add_token(cls, jti: str, expires_at: Optional[int] = None):
+        """
+        添加令牌到黑名单
+        
+        Args:
+            jti: 令牌ID
+            expires_at: 令牌过期时间戳 (exp)，为空时按刷新令牌有效期保留
+        """
+        revocation_store.revoke(jti, expires_at)
     
     @classmethod
     def is_token_revoked(cls, jti: str) -> bool:
         """检查令牌是否被撤销"""
-        return jti in cls._blacklist
+        return revocation_store.is_revoked(jti)
     
     @classmethod
-    def clear_expired_tokens(cls):
-        """清理过期的令牌 (简单实现)"""
-        # 在实际应用中，应该定期清理过期的令牌
-        # 这里只是一个占位符实现
-        pass
+    def clear_expired_tokens(cls) -> int:
+        """清理过期的令牌，返回清理数量"""
+        return revocation_store.sweep()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+游标分页 (keyset pagination)
+用 (排序列, id) 作为位置，WHERE (col, id) < (:v, :id) 代替 OFFSET，
+不执行 COUNT(*)，翻到多深都只扫描一页数据
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from sqlalchemy import DateTime, asc, desc, literal, tuple_
+
+class CursorError(ValueError):
+    """游标无效或与当前查询条件不匹配"""
+
+def encode_cursor(sort_field: str, order: str, value: Any, last_id: int) -> str:
+    """
+    生成不透明的游标字符串
+
+    Args:
+        sort_field: 排序字段名
+        order: 排序方向
+        value: 当前页最后一行的排序列值
+        last_id: 当前页最后一行的ID
+
+    Returns:
+        str: URL安全的base64字符串
+    """
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({'s': sort_field, 'o': order, 'v': value, 'id': last_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> dict:
+    """
+    解析游标字符串
+
+    Raises:
+        CursorError: 游标格式错误
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(data, dict) or not {'s', 'o', 'v', 'id'} <= data.keys():
+            raise ValueError
+        return data
+    except (ValueError, UnicodeError, binascii.Error):
+        raise CursorError('无效的分页游标')
+
+class KeysetPage:
+    """游标分页结果 (属性与 Flask-SQLAlchemy 的 Pagination 对齐)"""
+
+    def __init__(self, items: List, per_page: int, next_cursor: Optional[str]):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.page = None
+        self.total = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+def keyset_paginate(query, model, sort_field: str, order: str, per_page: int,
+                    cursor: Optional[str] = None) -> KeysetPage:
+    """
+    按 (sort_field, id) 进行游标分页
+
+    Args:
+        query: 尚未排序的查询
+        model: 模型类 (提供排序列和id列)
+        sort_field: 排序字段 (必须是非空列)
+        order: 排序方向 asc / desc
+        per_page: 每页数量
+        cursor: 上一页返回的 next_cursor，为空时从第一页开始
+
+    Returns:
+        KeysetPage: 分页结果
+
+    Raises:
+        CursorError: 游标无效，或生成游标时的排序条件与本次请求不同
+    """
+    sort_column = getattr(model, sort_field)
+    id_column = model.id
+    direction = asc if order == 'asc' else desc
+
+    if cursor:
+        position = decode_cursor(cursor)
+        if position['s'] != sort_field or position['o'] != order:
+            raise CursorError('分页游标与排序条件不匹配')
+
+        value = position['v']
+        if isinstance(sort_column.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise CursorError('无效的分页游标')
+
+        key = tuple_(sort_column, id_column)
+        boundary = tuple_(literal(value, sort_column.type), literal(position['id'], id_column.type))
+        query = query.filter(key > boundary if order == 'asc' else key < boundary)
+
+    # 多取一行用于判断是否还有下一页
+    rows = query.order_by(direction(sort_column), direction(id_column)).limit(per_page + 1).all()
+    items = rows[:per_page]
+
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(sort_field, order, getattr(last, sort_field), last.id)
+
+    return KeysetPage(items, per_page, next_cursor)
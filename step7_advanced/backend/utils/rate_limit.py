@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用户级限流 (令牌桶)
+按JWT身份或客户端IP为每个接口维护一个令牌桶，令牌按固定速率补充，允许短时突发；
+进程内后端每次检查O(1)并定期清理已回满的桶，Redis后端用Lua脚本在服务端原子地完成补充和扣减
+"""
+
+import hashlib
+import math
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+from utils.resp import RespClient
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+class RateLimit(NamedTuple):
+    """限流配额: period 秒内最多 amount 次"""
+    amount: int
+    period: int
+
+    @property
+    def rate(self) -> float:
+        """每秒补充的令牌数"""
+        return self.amount / self.period
+
+class RateLimitResult(NamedTuple):
+    """一次检查的结果"""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # 令牌桶回满所需秒数
+    retry_after: float  # 被拒绝时距下一个可用令牌的秒数
+
+@lru_cache(maxsize=128)
+def parse_rate_limit(value: str) -> RateLimit:
+    """
+    解析限流配额字符串
+
+    支持与 Flask-Limiter 相同的写法，如 '100 per hour'、'10/minute'、'5 per 30 seconds'
+
+    Raises:
+        ValueError: 格式错误
+    """
+    match = re.fullmatch(
+        r'\s*(\d+)\s*(?:per|/)\s*(\d+)?\s*(second|minute|hour|day)s?\s*',
+        value.lower()
+    )
+    if not match:
+        raise ValueError(f'无效的限流配额: {value}')
+    amount, multiplier, unit = match.groups()
+    return RateLimit(int(amount), int(multiplier or 1) * PERIODS[unit])
+
+def _result(limit: RateLimit, tokens: float, allowed: bool, cost: int) -> RateLimitResult:
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit.amount,
+        remaining=max(0, int(tokens)),
+        reset_after=(limit.amount - tokens) / limit.rate,
+        retry_after=0.0 if allowed else (cost - tokens) / limit.rate
+    )
+
+class RateLimitBackend:
+    """限流后端接口"""
+
+    def hit(self, key: str, limit: RateLimit, cost: int = 1) -> RateLimitResult:
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    进程内令牌桶
+
+    每个桶只保存 [令牌数, 更新时间, 回满时间]，检查时按经过的时间补充令牌；
+    回满的桶与不存在的桶等价，每隔 compact_interval 秒顺带清理一次，均摊后仍为O(1)
+    """
+
+    def __init__(self, compact_interval: int = 60):
+        self.compact_interval = compact_interval
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._next_compact = time.monotonic() + compact_interval
+
+    def hit(self, key, limit, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_compact:
+                self._compact(now)
+
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = float(limit.amount)
+            else:
+                tokens = min(limit.amount, bucket[0] + (now - bucket[1]) * limit.rate)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = [tokens, now, now + (limit.amount - tokens) / limit.rate]
+
+        return _result(limit, tokens, allowed, cost)
+
+    def _compact(self, now: float):
+        """删除已经回满的桶"""
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        self._next_compact = now + self.compact_interval
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Redis令牌桶 (多进程共享)
+
+    补充、扣减和过期时间设置在一个Lua脚本中完成，时间取自Redis服务器，
+    不受各worker时钟差异影响；桶在回满后自动过期
+    """
+
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, prefix: str = 'ratelimit:'):
+        self.client = RespClient(url)
+        self.prefix = prefix
+        self._sha = hashlib.sha1(self.SCRIPT.encode('utf-8')).hexdigest()
+
+    def hit(self, key, limit, cost=1):
+        args = (1, self.prefix + key, limit.amount, repr(limit.rate), cost)
+        try:
+            allowed, tokens = self.client.execute('EVALSHA', self._sha, *args)
+        except RuntimeError as e:
+            if not str(e).startswith('NOSCRIPT'):
+                raise
+            # 脚本尚未缓存时用EVAL执行一次，之后走EVALSHA
+            allowed, tokens = self.client.execute('EVAL', self.SCRIPT, *args)
+        return _result(limit, float(tokens), bool(allowed), cost)
+
+    def reset(self):
+        pass  # 键自带过期时间
+
+class RateLimiter:
+    """用户级限流器"""
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.backend: Optional[RateLimitBackend] = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """初始化应用"""
+        self.app = app
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+
+        if app.config.get('USER_RATELIMIT_BACKEND', 'memory') == 'redis':
+            self.backend = RedisRateLimitBackend(app.config['USER_RATELIMIT_REDIS_URL'])
+        else:
+            self.backend = MemoryRateLimitBackend(app.config.get('USER_RATELIMIT_COMPACT_INTERVAL', 60))
+
+        app.extensions['rate_limiter'] = self
+
+    def hit(self, key: str, limit: str, cost: int = 1) -> Optional[RateLimitResult]:
+        """
+        消耗一个令牌
+
+        Args:
+            key: 限流键 (接口 + 身份)
+            limit: 配额字符串
+            cost: 本次消耗的令牌数
+
+        Returns:
+            RateLimitResult: 检查结果，限流关闭或后端不可用时返回None (放行)
+        """
+        if not self.enabled or self.backend is None:
+            return None
+        try:
+            return self.backend.hit(key, parse_rate_limit(limit), cost)
+        except (OSError, ConnectionError, RuntimeError) as e:
+            # 共享后端故障时放行，不影响正常访问
+            if self.app is not None:
+                self.app.logger.error(f'限流检查失败: {e}')
+            return None
+
+    @staticmethod
+    def headers(result: RateLimitResult) -> Dict[str, str]:
+        """X-RateLimit-* 响应头 (Reset 为桶回满时的Unix时间戳)"""
+        headers = {
+            'X-RateLimit-Limit': str(result.limit),
+            'X-RateLimit-Remaining': str(result.remaining),
+            'X-RateLimit-Reset': str(math.ceil(time.time() + result.reset_after))
+        }
+        if not result.allowed:
+            headers['Retry-After'] = str(max(1, math.ceil(result.retry_after)))
+        return headers
+
+# 全局实例 (在 app.init_extensions 中初始化)
+rate_limiter = RateLimiter()
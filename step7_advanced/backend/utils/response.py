@@ -2,12 +2,15 @@
 # -*- coding: utf-8 -*-
 """
 统一API响应格式工具
-提供标准化的JSON响应格式
+提供标准化的JSON响应格式 (由 utils.json_codec 直接编码为字节串)
 """
 
-from flask import jsonify
-from typing import Any, Dict, Optional, Union
-from datetime import datetime
+import hashlib
+from flask import current_app, request
+from typing import Any, Dict, Iterable, Optional, Union
+from datetime import datetime, timezone
+
+from utils.json_codec import json_codec
 
 class ResponseCode:
     """响应状态码常量"""
@@ -66,7 +69,7 @@ def success_response(
     # 添加额外字段
     response_data.update(kwargs)
     
-    return jsonify(response_data), status_code
+    return json_codec.response(response_data), status_code
 
 def error_response(
     message: str = ResponseMessage.ERROR,
@@ -103,7 +106,7 @@ def error_response(
     # 添加额外字段
     response_data.update(kwargs)
     
-    return jsonify(response_data), status_code
+    return json_codec.response(response_data), status_code
 
 def validation_error_response(
     message: str = ResponseMessage.VALIDATION_ERROR,
@@ -253,34 +256,47 @@ def internal_error_response(
 
 def paginated_response(
     data: list,
-    page: int,
+    page: Optional[int],
     per_page: int,
-    total: int,
-    message: str = ResponseMessage.SUCCESS
+    total: Optional[int],
+    message: str = ResponseMessage.SUCCESS,
+    next_cursor: Optional[str] = None,
+    has_next: Optional[bool] = None
 ) -> tuple:
     """
     分页响应格式
     
     Args:
         data: 分页数据
-        page: 当前页码
+        page: 当前页码 (游标分页时为None)
         per_page: 每页数量
-        total: 总数量
+        total: 总数量 (游标分页不统计总数，为None)
         message: 响应消息
+        next_cursor: 下一页游标 (游标分页)
+        has_next: 是否有下一页 (未统计总数时由调用方提供)
     
     Returns:
         tuple: (响应JSON, HTTP状态码)
     """
     import math
     
-    pagination_info = {
-        'page': page,
-        'per_page': per_page,
-        'total': total,
-        'pages': math.ceil(total / per_page) if per_page > 0 else 0,
-        'has_prev': page > 1,
-        'has_next': page < math.ceil(total / per_page) if per_page > 0 else False
-    }
+    if total is None:
+        # 游标分页: 不执行COUNT，只返回是否有下一页
+        pagination_info = {
+            'per_page': per_page,
+            'total': None,
+            'has_next': bool(has_next if has_next is not None else next_cursor),
+            'next_cursor': next_cursor
+        }
+    else:
+        pagination_info = {
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': math.ceil(total / per_page) if per_page > 0 else 0,
+            'has_prev': page > 1,
+            'has_next': page < math.ceil(total / per_page) if per_page > 0 else False
+        }
     
     return success_response(
         data=data,
@@ -288,6 +304,70 @@ def paginated_response(
         pagination=pagination_info
     )
 
+# 条件请求 (ETag / Last-Modified)
+def generate_etag(*parts: Any) -> str:
+    """
+    根据资源的版本信息 (ID、updated_at、计数等) 生成ETag
+    
+    Args:
+        *parts: 能唯一确定响应内容的值
+    
+    Returns:
+        str: ETag (不含引号)
+    """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def latest_modified(timestamps: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    """取一组时间中最新的一个 (用于列表的Last-Modified)"""
+    return max((ts for ts in timestamps if ts is not None), default=None)
+
+def _http_datetime(value: Optional[datetime]) -> Optional[datetime]:
+    """数据库中为UTC naive时间，HTTP日期精确到秒"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    判断客户端缓存是否仍然有效
+    
+    If-None-Match 优先 (按弱比较，强弱ETag都能匹配)；没有时才比较 If-Modified-Since
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return _http_datetime(last_modified) <= request.if_modified_since
+    return False
+
+def with_validators(rv, etag: str, last_modified: Optional[datetime] = None, weak: bool = False):
+    """
+    为响应添加 ETag / Last-Modified 头
+    
+    Args:
+        rv: 视图返回值 (如 success_response 的结果)
+        etag: generate_etag 生成的ETag
+        last_modified: 资源最后修改时间
+        weak: 是否为弱ETag (响应体中有不参与ETag计算、允许略有出入的内容，如实时浏览量)
+    
+    Returns:
+        Response: 响应对象
+    """
+    response = current_app.make_response(rv)
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = _http_datetime(last_modified)
+    # 允许客户端缓存，但每次使用前都需要重新验证
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None, weak: bool = False):
+    """304 Not Modified 响应"""
+    return with_validators(current_app.response_class(status=304), etag, last_modified, weak)
+
 # 响应装饰器
 def api_response(func):
     """
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JWT撤销存储
+记录已撤销令牌的 jti 及其过期时间，支持进程内、数据库表、Redis协议服务器三种后端。
+每个进程在本地维护已撤销集合的副本并定期与后端同步，
+请求时的撤销检查是O(1)的内存操作，不会每次都访问后端
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RevokedToken
+from utils.resp import RespClient
+
+class RevocationBackend:
+    """撤销存储后端接口 (过期时间均为Unix时间戳)"""
+
+    def add(self, jti: str, expires_at: int):
+        raise NotImplementedError
+
+    def active(self, now: int) -> Dict[str, int]:
+        """所有未过期的 {jti: expires_at}"""
+        raise NotImplementedError
+
+    def purge(self, now: int) -> int:
+        """删除已过期的记录，返回删除数量"""
+        raise NotImplementedError
+
+class MemoryRevocationBackend(RevocationBackend):
+    """进程内后端 (单进程部署或测试使用)"""
+
+    def __init__(self):
+        self._tokens: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._tokens[jti] = expires_at
+
+    def active(self, now):
+        with self._lock:
+            return {jti: exp for jti, exp in self._tokens.items() if exp > now}
+
+    def purge(self, now):
+        with self._lock:
+            expired = [jti for jti, exp in self._tokens.items() if exp <= now]
+            for jti in expired:
+                del self._tokens[jti]
+        return len(expired)
+
+class DatabaseRevocationBackend(RevocationBackend):
+    """数据库后端 (revoked_tokens 表，多个worker进程共享)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.table = RevokedToken.__table__
+
+    def _begin(self):
+        return db.engine.begin()
+
+    def add(self, jti, expires_at):
+        with self.app.app_context(), self._begin() as connection:
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(self.table).values(jti=jti, expires_at=expires_at))
+            except IntegrityError:
+                pass  # 同一令牌重复登出
+
+    def active(self, now):
+        with self.app.app_context(), self._begin() as connection:
+            return dict(connection.execute(
+                select(self.table.c.jti, self.table.c.expires_at)
+                .where(self.table.c.expires_at > now)
+            ).all())
+
+    def purge(self, now):
+        with self.app.app_context(), self._begin() as connection:
+            return connection.execute(
+                delete(self.table).where(self.table.c.expires_at <= now)
+            ).rowcount
+
+class RedisRevocationBackend(RevocationBackend):
+    """
+    Redis后端
+
+    使用一个有序集合，成员为jti、分值为过期时间戳:
+    同步用ZRANGEBYSCORE，清理用ZREMRANGEBYSCORE
+    """
+
+    def __init__(self, url: str, key: str = 'revoked_tokens'):
+        self.client = RespClient(url)
+        self.key = key
+
+    def add(self, jti, expires_at):
+        self.client.execute('ZADD', self.key, expires_at, jti)
+
+    def active(self, now):
+        values = self.client.execute('ZRANGEBYSCORE', self.key, f'({now}', '+inf', 'WITHSCORES')
+        return {values[i]: int(float(values[i + 1])) for i in range(0, len(values), 2)}
+
+    def purge(self, now):
+        return self.client.execute('ZREMRANGEBYSCORE', self.key, '-inf', now)
+
+class RevocationStore:
+    """
+    令牌撤销存储
+
+    本地副本为 {jti: exp} 字典，检查时只查字典并按过期时间判断 (过期条目惰性删除)，
+    不访问后端；本进程的撤销立即写入副本，其他进程的撤销最迟在一个同步周期后被本进程感知
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend: Optional[RevocationBackend] = None
+        self.default_ttl = 30 * 24 * 3600
+        self.sync_interval = 5
+        self.sweep_interval = 300
+
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, int] = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """初始化应用、执行首次同步并启动后台同步线程"""
+        self.shutdown()
+
+        self.app = app
+        self.default_ttl = int(app.config.get('JWT_REFRESH_TOKEN_EXPIRES').total_seconds())
+        self.sync_interval = app.config.get('TOKEN_REVOCATION_SYNC_INTERVAL', 5)
+        self.sweep_interval = app.config.get('TOKEN_REVOCATION_SWEEP_INTERVAL', 300)
+        self.backend = self._create_backend(app)
+        app.extensions['revocation_store'] = self
+
+        with self._lock:
+            self._tokens = {}
+
+        if not isinstance(self.backend, MemoryRevocationBackend):
+            self.sync()
+        self._start()
+
+    @staticmethod
+    def _create_backend(app) -> RevocationBackend:
+        backend = app.config.get('TOKEN_REVOCATION_BACKEND', 'memory')
+        if backend == 'database':
+            return DatabaseRevocationBackend(app)
+        if backend == 'redis':
+            return RedisRevocationBackend(app.config['TOKEN_REVOCATION_REDIS_URL'])
+        return MemoryRevocationBackend()
+
+    def _start(self):
+        """启动后台同步/清理线程"""
+        if not self.sync_interval or self.sync_interval <= 0:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='token-revocation-sync', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        last_sweep = time.monotonic()
+        while not self._stop_event.wait(self.sync_interval):
+            if time.monotonic() - last_sweep >= self.sweep_interval:
+                self.sweep()
+                last_sweep = time.monotonic()
+            if not isinstance(self.backend, MemoryRevocationBackend):
+                self.sync()
+
+    def revoke(self, jti: str, expires_at: Optional[int] = None):
+        """
+        撤销令牌
+
+        Args:
+            jti: 令牌ID
+            expires_at: 令牌过期时间戳 (exp)，过期后记录自动清除
+        """
+        now = int(time.time())
+        if expires_at is None:
+            expires_at = now + self.default_ttl
+        if expires_at <= now:
+            return  # 已过期的令牌本身就无法通过验证
+
+        self.backend.add(jti, int(expires_at))
+        with self._lock:
+            self._tokens[jti] = int(expires_at)
+
+    def is_revoked(self, jti: str) -> bool:
+        """
+        检查令牌是否已撤销 (只读本地副本)
+
+        其他进程刚撤销的令牌在本进程下一次同步之前
+        (最长 TOKEN_REVOCATION_SYNC_INTERVAL 秒，同步失败时更久) 仍会被视为有效
+        """
+        expires_at = self._tokens.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at > time.time():
+            return True
+        with self._lock:
+            self._tokens.pop(jti, None)  # 惰性删除过期条目
+        return False
+
+    def sync(self) -> bool:
+        """从后端加载全部未过期的撤销记录，重建本地副本"""
+        try:
+            tokens = self.backend.active(int(time.time()))
+        except Exception as e:
+            # 首次启动时表可能尚未创建 (flask init-db)，下个同步周期会重试
+            self._log(f'同步令牌撤销列表失败: {e}', level='warning')
+            return False
+
+        with self._lock:
+            # 保留同步期间本进程新增的撤销
+            for jti, expires_at in self._tokens.items():
+                tokens.setdefault(jti, expires_at)
+            self._tokens = tokens
+        return True
+
+    def sweep(self) -> int:
+        """
+        清理过期记录 (本地副本和后端)
+
+        Returns:
+            int: 后端删除的记录数
+        """
+        now = int(time.time())
+        with self._lock:
+            self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+        try:
+            return self.backend.purge(now)
+        except Exception as e:
+            self._log(f'清理过期的撤销记录失败: {e}')
+            return 0
+
+    def _log(self, message: str, level: str = 'error'):
+        if self.app is not None:
+            getattr(self.app.logger, level)(message)
+
+    def shutdown(self):
+        """停止后台线程"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+# 全局实例 (在 app.init_extensions 中初始化)
+revocation_store = RevocationStore()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章全文搜索
+基于SQLite FTS5外部内容表 (external content table) 实现，
+由触发器与 articles 表保持同步，支持BM25相关度排序和高亮摘要
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import column, event, func, literal_column, table, text
+
+from models import db, Article
+
+# trigram分词器按3个字符切分，能像 LIKE '%kw%' 一样匹配中文子串
+FTS_MIN_TERM_LENGTH = 3
+
+FTS_TABLE = 'articles_fts'
+
+CREATE_FTS_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, summary, content,
+    content='articles', content_rowid='id',
+    tokenize='trigram'
+)
+"""
+
+CREATE_FTS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON articles BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON articles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+    END
+    """,
+    # 只在可搜索字段变化时重建索引行，浏览量/点赞更新不会触发
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, summary, content ON articles BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary, content)
+        VALUES ('delete', old.id, old.title, old.summary, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, summary, content)
+        VALUES (new.id, new.title, new.summary, new.content);
+    END
+    """
+]
+
+# BM25列权重: 标题 > 摘要 > 正文
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+class ArticleSearchIndex:
+    """文章全文索引"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready_engines = set()
+        self._fts = table(FTS_TABLE, column('rowid'))
+
+    @staticmethod
+    def is_supported(bind) -> bool:
+        """只有SQLite支持FTS5，其他数据库回退到LIKE查询"""
+        return bind.dialect.name == 'sqlite'
+
+    def create(self, connection):
+        """创建FTS5虚拟表和同步触发器 (幂等)"""
+        connection.execute(text(CREATE_FTS_TABLE))
+        for trigger in CREATE_FTS_TRIGGERS:
+            connection.execute(text(trigger))
+
+    def rebuild(self):
+        """根据 articles 表全量重建索引"""
+        if not self.is_supported(db.engine):
+            return False
+
+        with db.engine.begin() as connection:
+            self.create(connection)
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')"))
+        self._ready_engines.add(db.engine)
+        return True
+
+    def ensure(self) -> bool:
+        """
+        确保索引存在 (每个进程只检查一次)
+
+        对于在引入全文索引之前创建的数据库，首次搜索时自动建表并重建索引
+
+        Returns:
+            bool: 索引是否可用
+        """
+        engine = db.engine
+        if engine in self._ready_engines:
+            return True
+        if not self.is_supported(engine):
+            return False
+
+        with self._lock:
+            if engine in self._ready_engines:
+                return True
+            try:
+                with engine.connect() as connection:
+                    exists = connection.execute(
+                        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                        {'name': FTS_TABLE}
+                    ).first()
+                if not exists:
+                    self.rebuild()
+                self._ready_engines.add(engine)
+            except Exception:
+                # SQLite未编译FTS5或不支持trigram分词器
+                return False
+        return True
+
+    @staticmethod
+    def build_match_query(keyword: str) -> Optional[str]:
+        """
+        把用户输入转换为FTS5 MATCH表达式
+
+        每个词作为短语加双引号 (转义内部引号)，多个词之间为AND关系。
+        存在少于3个字符的词时trigram无法匹配，返回None由调用方回退到LIKE
+
+        Args:
+            keyword: 搜索关键词
+
+        Returns:
+            str: MATCH表达式，无法使用全文索引时返回None
+        """
+        terms = keyword.split()
+        if not terms or any(len(term) < FTS_MIN_TERM_LENGTH for term in terms):
+            return None
+        return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+    def apply(self, query, match_query: str, order_by_rank: bool = True):
+        """
+        为文章查询加上全文匹配条件
+
+        Args:
+            query: Article查询
+            match_query: build_match_query 生成的MATCH表达式
+            order_by_rank: 是否按BM25相关度排序
+
+        Returns:
+            Query: 添加了匹配条件的查询
+        """
+        fts_column = literal_column(FTS_TABLE)
+        query = query.join(self._fts, self._fts.c.rowid == Article.id)\
+            .filter(fts_column.op('MATCH')(match_query))
+
+        if order_by_rank:
+            query = query.order_by(func.bm25(fts_column, *BM25_WEIGHTS))
+        return query
+
+    def highlights(self, match_query: str, article_ids: List[int]) -> Dict[int, Dict[str, str]]:
+        """
+        批量生成标题高亮和正文摘要片段
+
+        Args:
+            match_query: MATCH表达式
+            article_ids: 当前页的文章ID
+
+        Returns:
+            dict: {文章ID: {'title': 高亮标题, 'snippet': 正文片段}}
+        """
+        if not article_ids:
+            return {}
+
+        fts_column = literal_column(FTS_TABLE)
+        rows = db.session.query(
+            self._fts.c.rowid,
+            func.highlight(fts_column, 0, '<mark>', '</mark>'),
+            func.snippet(fts_column, 2, '<mark>', '</mark>', '...', 32)
+        ).select_from(self._fts)\
+            .filter(fts_column.op('MATCH')(match_query))\
+            .filter(self._fts.c.rowid.in_(article_ids))\
+            .all()
+
+        return {
+            rowid: {'title': title, 'snippet': snippet}
+            for rowid, title, snippet in rows
+        }
+
+# 全局实例
+search_index = ArticleSearchIndex()
+
+@event.listens_for(Article.__table__, 'after_create')
+def _create_search_index(target, connection, **kwargs):
+    """db.create_all() 创建 articles 表后同时创建全文索引"""
+    if search_index.is_supported(connection):
+        try:
+            search_index.create(connection)
+        except Exception:
+            pass
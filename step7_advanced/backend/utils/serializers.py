@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+序列化器注册表
+模型的输出字段只声明一次，按投影 (list / detail / search 等) 编译成 (键, 取值函数) 列表后缓存复用；
+客户端可以用 ?fields= 选择字段子集，查询只加载被选中字段用到的列和关系，
+未被选中的关系不会加载，未用到的列 (如正文) 不会出现在SELECT中
+"""
+
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from models import Article, Tag, User, make_excerpt
+
+class FieldSelectionError(ValueError):
+    """?fields= 中包含当前投影不支持的字段"""
+
+class SerializerField:
+    """
+    输出字段
+
+    Args:
+        getter: 属性名，或接收对象返回值的函数
+        columns: 取值用到的列名 (属性名时默认为该列)
+        key: 输出的键名，默认与字段名相同
+    """
+
+    relation = None
+
+    def __init__(self, getter=None, columns: Sequence[str] = (), key: Optional[str] = None):
+        self.name = None
+        self.key = key
+        self.getter = getter
+        self.columns = tuple(columns)
+
+    def bind(self, name: str):
+        self.name = name
+        self.key = self.key or name
+        if self.getter is None:
+            self.getter = name
+        if isinstance(self.getter, str):
+            self.columns = self.columns or (self.getter,)
+            self.getter = attrgetter(self.getter)
+
+    def compile(self) -> Callable[[Any], Any]:
+        return self.getter
+
+class Nested(SerializerField):
+    """
+    关系字段
+
+    Args:
+        relation: 关系属性名
+        serializer: 关联模型的序列化器名称
+        projection: 关联对象使用的投影
+        many: 是否为一对多/多对多
+        loader: 预加载方式 joined / selectin
+        columns: 本模型上关系用到的外键列
+    """
+
+    def __init__(self, relation: str, serializer: str, projection: str = 'ref', many: bool = False,
+                 loader: str = 'joined', columns: Sequence[str] = (), key: Optional[str] = None):
+        super().__init__(relation, columns, key)
+        self.relation = relation
+        self.serializer = serializer
+        self.projection = projection
+        self.many = many
+        self.loader = loader
+
+    def bind(self, name: str):
+        self.name = name
+        self.key = self.key or name
+        self.getter = attrgetter(self.relation)
+
+    def compile(self):
+        get = self.getter
+        dump = get_serializer(self.serializer).compile(self.projection)
+        if self.many:
+            return lambda obj: [dump(item) for item in get(obj)]
+        return lambda obj: None if (value := get(obj)) is None else dump(value)
+
+    def loader_option(self, model):
+        serializer = get_serializer(self.serializer)
+        load = joinedload if self.loader == 'joined' else selectinload
+        option = load(getattr(model, self.relation))
+        columns = serializer.columns(self.projection)
+        if columns:
+            option = option.load_only(*(getattr(serializer.model, name) for name in columns))
+        nested = serializer.relation_options(self.projection)
+        return option.options(*nested) if nested else option
+
+class ModelSerializer:
+    """
+    模型序列化器
+
+    Args:
+        model: 模型类
+        fields: 字段名 -> SerializerField
+        projections: 投影名 -> 字段名列表 (决定输出顺序)
+        required: ?fields= 选择子集时总会输出的键
+    """
+
+    def __init__(self, model, fields: Dict[str, SerializerField], projections: Dict[str, Sequence[str]],
+                 required: Sequence[str] = ('id',)):
+        self.model = model
+        self.fields = fields
+        for name, field in fields.items():
+            field.bind(name)
+        self.projections = {
+            name: tuple(fields[field_name] for field_name in field_names)
+            for name, field_names in projections.items()
+        }
+        self.required = tuple(required)
+        self.compile = lru_cache(maxsize=256)(self._compile)
+
+    def _fields(self, projection: str, keys: Optional[Tuple[str, ...]] = None) -> Tuple[SerializerField, ...]:
+        fields = self.projections[projection]
+        if keys is None:
+            return fields
+        return tuple(field for field in fields if field.key in keys)
+
+    def select(self, projection: str, value: Optional[str]) -> Optional[Tuple[str, ...]]:
+        """
+        解析 ?fields= 参数
+
+        Args:
+            projection: 投影名
+            value: 逗号分隔的键名，为空时表示输出整个投影
+
+        Returns:
+            Tuple[str]: 选中的键 (按投影顺序，包含 required)，未指定时返回None
+
+        Raises:
+            FieldSelectionError: 包含投影中不存在的键
+        """
+        if not value:
+            return None
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        available = [field.key for field in self.projections[projection]]
+        unknown = requested.difference(available)
+        if unknown:
+            raise FieldSelectionError(
+                f'不支持的字段: {", ".join(sorted(unknown))}，可选字段: {", ".join(available)}'
+            )
+        requested.update(self.required)
+        return tuple(key for key in available if key in requested)
+
+    def _compile(self, projection: str, keys: Optional[Tuple[str, ...]] = None) -> Callable[[Any], Dict]:
+        pairs = [(field.key, field.compile()) for field in self._fields(projection, keys)]
+
+        def dump(obj):
+            return {key: get(obj) for key, get in pairs}
+
+        return dump
+
+    def dump(self, obj, projection: str = 'detail', keys: Optional[Tuple[str, ...]] = None) -> Dict:
+        """序列化单个对象"""
+        return self.compile(projection, keys)(obj)
+
+    def dump_many(self, objs: Iterable, projection: str = 'list', keys: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+        """序列化对象列表 (同一投影只编译一次)"""
+        dump = self.compile(projection, keys)
+        return [dump(obj) for obj in objs]
+
+    def columns(self, projection: str, keys: Optional[Tuple[str, ...]] = None,
+                extra: Iterable[str] = ()) -> Tuple[str, ...]:
+        """投影用到的列名 (总会包含主键)"""
+        names = {'id', *extra}
+        for field in self._fields(projection, keys):
+            names.update(field.columns)
+        mapper_columns = self.model.__mapper__.column_attrs.keys()
+        return tuple(name for name in mapper_columns if name in names)
+
+    def relation_options(self, projection: str, keys: Optional[Tuple[str, ...]] = None) -> list:
+        return [
+            field.loader_option(self.model)
+            for field in self._fields(projection, keys)
+            if field.relation is not None
+        ]
+
+    def query_options(self, projection: str, keys: Optional[Tuple[str, ...]] = None,
+                      extra_columns: Iterable[str] = ()) -> list:
+        """
+        查询加载选项: 只加载投影用到的列，只预加载投影用到的关系
+
+        Args:
+            projection: 投影名
+            keys: select() 选中的键
+            extra_columns: 序列化之外还会读取的列 (如ETag、排序游标用到的列)
+        """
+        columns = self.columns(projection, keys, extra_columns)
+        return [
+            load_only(*(getattr(self.model, name) for name in columns)),
+            *self.relation_options(projection, keys)
+        ]
+
+    def restrict(self, data: Dict, keys: Optional[Tuple[str, ...]]) -> Dict:
+        """从已序列化的完整数据中取出选中的键 (用于缓存了完整投影的接口)"""
+        if keys is None:
+            return data
+        return {key: data[key] for key in keys if key in data}
+
+# 注册表
+_serializers: Dict[str, ModelSerializer] = {}
+
+def register_serializer(name: str, serializer: ModelSerializer) -> ModelSerializer:
+    """注册序列化器，关系字段按名称引用"""
+    _serializers[name] = serializer
+    return serializer
+
+def get_serializer(name: str) -> ModelSerializer:
+    return _serializers[name]
+
+def _article_summary(article):
+    """列表摘要: 没有填写摘要时使用存储的正文摘录，不加载正文"""
+    if article.summary:
+        return article.summary
+    # 新增摘录列之前的文章在执行 flask rebuild-excerpts 前没有摘录，只能读取正文
+    return article.excerpt or make_excerpt(article.content)
+
+register_serializer('user', ModelSerializer(User, {
+    'id': SerializerField(),
+    'username': SerializerField(),
+}, projections={
+    'ref': ('id', 'username'),
+}))
+
+register_serializer('tag', ModelSerializer(Tag, {
+    'id': SerializerField(),
+    'name': SerializerField(),
+}, projections={
+    'ref': ('id', 'name'),
+}))
+
+article_serializer = register_serializer('article', ModelSerializer(Article, {
+    'id': SerializerField(),
+    'title': SerializerField(),
+    'content': SerializerField(),
+    'summary': SerializerField(),
+    'list_summary': SerializerField(_article_summary, columns=('summary', 'excerpt'), key='summary'),
+    'slug': SerializerField(),
+    'is_published': SerializerField(),
+    'featured_image': SerializerField(),
+    'views': SerializerField(),
+    'likes': SerializerField(),
+    'created_at': SerializerField(),
+    'updated_at': SerializerField(),
+    'author': Nested('author', 'user', columns=('author_id',)),
+    'tags': Nested('tags', 'tag', many=True, loader='selectin'),
+    'comment_count': SerializerField(),
+}, projections={
+    'list': ('id', 'title', 'list_summary', 'slug', 'is_published', 'featured_image', 'views', 'likes',
+             'created_at', 'updated_at', 'author', 'tags', 'comment_count'),
+    'detail': ('id', 'title', 'content', 'summary', 'slug', 'is_published', 'featured_image', 'views',
+               'likes', 'created_at', 'updated_at', 'author', 'tags', 'comment_count'),
+    'search': ('id', 'title', 'list_summary', 'slug', 'featured_image', 'views', 'likes',
+               'created_at', 'author', 'tags'),
+}))
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内后台任务队列
+把通知等耗时的副作用移出请求线程：有界队列 + 可配置的工作线程池
+(普通线程或线程中运行的asyncio事件循环)，失败按指数退避重试，退出时排空队列
+"""
+
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict
+
+class Task:
+    """后台任务"""
+
+    def __init__(self, func: Callable, args: tuple, kwargs: Dict[str, Any], max_retries: int):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.max_retries = max_retries
+        self.attempt = 0
+
+    @property
+    def name(self) -> str:
+        return getattr(self.func, '__name__', repr(self.func))
+
+    @property
+    def is_coroutine(self) -> bool:
+        return asyncio.iscoroutinefunction(self.func)
+
+class TaskQueue:
+    """
+    后台任务队列
+
+    模式 (TASK_QUEUE_MODE):
+        thread: N个工作线程从有界队列取任务，协程任务在工作线程里用 asyncio.run 执行
+        asyncio: 一个线程运行事件循环，最多N个任务并发，同步任务交给默认线程池
+        sync: 在调用线程中立即执行 (调试用)
+    """
+
+    _STOP = object()
+
+    def __init__(self, app=None):
+        self.app = None
+        self.mode = 'thread'
+        self.workers = 2
+        self.max_retries = 3
+        self.retry_backoff = 1.0
+        self.shutdown_timeout = 10
+
+        self._queue = None
+        self._threads = []
+        self._loop = None
+        self._semaphore = None
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._accepting = False
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'retried': 0, 'rejected': 0}
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """初始化应用并启动工作线程"""
+        if self._accepting:
+            self.shutdown()
+
+        self.app = app
+        self.mode = app.config.get('TASK_QUEUE_MODE', 'thread')
+        self.workers = max(1, app.config.get('TASK_QUEUE_WORKERS', 2))
+        self.max_retries = app.config.get('TASK_MAX_RETRIES', 3)
+        self.retry_backoff = app.config.get('TASK_RETRY_BACKOFF', 1.0)
+        self.shutdown_timeout = app.config.get('TASK_SHUTDOWN_TIMEOUT', 10)
+        self._queue = queue.Queue(maxsize=app.config.get('TASK_QUEUE_MAXSIZE', 1000))
+        app.extensions['task_queue'] = self
+
+        if self.mode == 'thread':
+            self._start_threads()
+        elif self.mode == 'asyncio':
+            self._start_loop()
+
+        self._accepting = True
+        atexit.register(self.shutdown)
+
+    def _start_threads(self):
+        """启动工作线程"""
+        self._threads = []
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f'task-worker-{index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _start_loop(self):
+        """启动运行事件循环的线程"""
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def run_loop():
+            asyncio.set_event_loop(self._loop)
+            self._semaphore = asyncio.Semaphore(self.workers)
+            ready.set()
+            self._loop.run_forever()
+
+        thread = threading.Thread(target=run_loop, name='task-event-loop', daemon=True)
+        thread.start()
+        ready.wait()
+        self._threads = [thread]
+
+    def submit(self, func: Callable, *args, max_retries: int = None, **kwargs) -> bool:
+        """
+        提交后台任务
+
+        Args:
+            func: 任务函数，可以是普通函数或 async 函数
+            *args: 位置参数 (应传递ID等简单值，不要传递ORM对象)
+            max_retries: 最大重试次数，默认使用 TASK_MAX_RETRIES
+            **kwargs: 关键字参数
+
+        Returns:
+            bool: 是否成功入队 (队列已满或已关闭时返回False)
+        """
+        if not self._accepting:
+            self._stats['rejected'] += 1
+            return False
+
+        task = Task(func, args, kwargs, self.max_retries if max_retries is None else max_retries)
+
+        with self._pending_lock:
+            if self._pending >= self._queue.maxsize > 0:
+                self._stats['rejected'] += 1
+                self._log('warning', f'后台任务队列已满，丢弃任务: {task.name}')
+                return False
+            self._pending += 1
+            self._stats['submitted'] += 1
+
+        if self.mode == 'sync':
+            self._run_with_retries(task)
+        elif self.mode == 'asyncio':
+            asyncio.run_coroutine_threadsafe(self._run_async(task), self._loop)
+        else:
+            self._queue.put_nowait(task)
+        return True
+
+    def _worker(self):
+        """工作线程循环"""
+        while True:
+            task = self._queue.get()
+            try:
+                if task is self._STOP:
+                    return
+                self._run_with_retries(task)
+            finally:
+                self._queue.task_done()
+
+    def _run_with_retries(self, task: Task):
+        """在当前线程中执行任务，失败时按指数退避重试"""
+        try:
+            while True:
+                try:
+                    with self.app.app_context():
+                        if task.is_coroutine:
+                            asyncio.run(task.func(*task.args, **task.kwargs))
+                        else:
+                            task.func(*task.args, **task.kwargs)
+                    self._stats['completed'] += 1
+                    return
+                except Exception as e:
+                    if not self._should_retry(task, e):
+                        return
+                    time.sleep(self._backoff(task))
+        finally:
+            self._task_finished()
+
+    async def _run_async(self, task: Task):
+        """在事件循环中执行任务"""
+        try:
+            async with self._semaphore:
+                while True:
+                    try:
+                        with self.app.app_context():
+                            if task.is_coroutine:
+                                await task.func(*task.args, **task.kwargs)
+                            else:
+                                await self._loop.run_in_executor(None, self._call_in_context, task)
+                        self._stats['completed'] += 1
+                        return
+                    except Exception as e:
+                        if not self._should_retry(task, e):
+                            return
+                        await asyncio.sleep(self._backoff(task))
+        finally:
+            self._task_finished()
+
+    def _call_in_context(self, task: Task):
+        """在线程池中执行同步任务 (应用上下文不会跨线程传递，需要重新推入)"""
+        with self.app.app_context():
+            task.func(*task.args, **task.kwargs)
+
+    def _should_retry(self, task: Task, error: Exception) -> bool:
+        """记录失败并判断是否需要重试"""
+        task.attempt += 1
+        if task.attempt > task.max_retries:
+            self._stats['failed'] += 1
+            self._log('error', f'后台任务 {task.name} 执行失败 (已尝试{task.attempt}次): {error}')
+            return False
+
+        self._stats['retried'] += 1
+        self._log('warning', f'后台任务 {task.name} 执行失败，准备第{task.attempt}次重试: {error}')
+        return True
+
+    def _backoff(self, task: Task) -> float:
+        """指数退避: backoff, 2*backoff, 4*backoff ..."""
+        return self.retry_backoff * (2 ** (task.attempt - 1))
+
+    def _task_finished(self):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def _log(self, level: str, message: str):
+        if self.app is not None:
+            getattr(self.app.logger, level)(message)
+
+    @property
+    def pending(self) -> int:
+        """排队中和执行中的任务数"""
+        return self._pending
+
+    def stats(self) -> Dict[str, int]:
+        """任务统计"""
+        return dict(self._stats, pending=self._pending)
+
+    def shutdown(self, timeout: float = None):
+        """
+        停止接收新任务并等待已提交的任务执行完毕
+
+        Args:
+            timeout: 最长等待时间 (秒)，默认使用 TASK_SHUTDOWN_TIMEOUT
+        """
+        if not self._accepting:
+            return
+        self._accepting = False
+        timeout = self.shutdown_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        if self.mode == 'thread':
+            # 队列已满时阻塞的 put 会无视超时，等不到空位就放弃，剩余任务随守护线程退出
+            for _ in self._threads:
+                try:
+                    self._queue.put(self._STOP, timeout=max(0, deadline - time.monotonic()))
+                except queue.Full:
+                    break
+            for thread in self._threads:
+                thread.join(timeout=max(0, deadline - time.monotonic()))
+        elif self.mode == 'asyncio':
+            while self._pending > 0 and time.monotonic() < deadline:
+                time.sleep(0.05)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._threads[0].join(timeout=max(0, deadline - time.monotonic()))
+
+        if self._pending > 0:
+            self._log('warning', f'后台任务队列关闭时仍有 {self._pending} 个任务未完成')
+        self._threads = []
+
+# 全局实例 (在 app.init_extensions 中初始化)
+task_queue = TaskQueue()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式上传解析
+直接用 werkzeug 的 MultipartDecoder 按块解析请求体，文件数据边读边写到目标路径，
+同时计算SHA-256、检查大小上限并根据文件头识别真实类型；
+超过上限时立即中止，不会先把整个请求体缓存到内存或临时文件
+"""
+
+import codecs
+import hashlib
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+CHUNK_SIZE = 64 * 1024
+SNIFF_SIZE = 512
+FORM_OVERHEAD = 64 * 1024  # 普通表单字段和分段头允许的额外字节数
+
+# 文件头 -> 类型
+MAGIC_NUMBERS = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'%PDF-', 'pdf'),
+    (b'PK\x03\x04', 'zip'),  # docx / xlsx / pptx
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'ole'),  # doc / xls / ppt
+)
+
+# 扩展名 -> 允许的真实类型
+EXTENSION_TYPES: Dict[str, Set[str]] = {
+    'png': {'png'},
+    'jpg': {'jpeg'},
+    'jpeg': {'jpeg'},
+    'gif': {'gif'},
+    'webp': {'webp'},
+    'pdf': {'pdf'},
+    'docx': {'zip'},
+    'xlsx': {'zip'},
+    'pptx': {'zip'},
+    'doc': {'ole'},
+    'xls': {'ole'},
+    'ppt': {'ole'},
+    'txt': {'text'},
+}
+
+class UploadError(Exception):
+    """上传被拒绝 (文件缺失、类型不符或超过大小限制)"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+class IngestedFile:
+    """已写入磁盘的上传文件"""
+
+    def __init__(self, filename: str, path: Optional[str]):
+        self.filename = filename
+        self.path = path
+        self.size = 0
+        self.kind: Optional[str] = None
+        self.error: Optional[str] = None  # 被拒绝的原因 (ingest_uploads 非严格模式)
+        self._sha256 = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """根据文件开头的字节识别文件类型，无法识别时返回None"""
+    for magic, kind in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return kind
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if b'\x00' not in head:
+        try:
+            # 截断处可能落在多字节字符中间，增量解码器不会把不完整的结尾当作错误
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=len(head) < SNIFF_SIZE)
+            return 'text'
+        except UnicodeDecodeError:
+            return None
+    return None
+
+def check_file_type(filename: str, head: bytes) -> str:
+    """
+    校验文件内容与扩展名是否一致
+
+    Raises:
+        UploadError: 内容与扩展名不符
+    """
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    kind = sniff_file_type(head)
+    expected = EXTENSION_TYPES.get(extension)
+    if expected is not None and kind not in expected:
+        raise UploadError('文件内容与扩展名不符')
+    return kind
+
+class _FileWriter:
+    """把一个文件分段写入目标路径，同时计算哈希、检查大小和文件类型"""
+
+    def __init__(self, upload: IngestedFile, max_size: int):
+        self.upload = upload
+        self.max_size = max_size
+        self._head = b''
+        self._sniffed = False
+        self._file = open(upload.path, 'wb')
+
+    def write(self, data: bytes):
+        upload = self.upload
+        upload.size += len(data)
+        if upload.size > self.max_size:
+            raise UploadError(f'文件大小超过限制 ({self.max_size // (1024*1024)}MB)')
+
+        if not self._sniffed:
+            self._head += data[:SNIFF_SIZE - len(self._head)]
+            if len(self._head) >= SNIFF_SIZE:
+                self._sniff()
+
+        upload._sha256.update(data)
+        self._file.write(data)
+
+    def _sniff(self):
+        self._sniffed = True
+        self.upload.kind = check_file_type(self.upload.filename, self._head)
+
+    def finish(self):
+        if not self._sniffed:
+            self._sniff()
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+        if os.path.exists(self.upload.path):
+            os.remove(self.upload.path)
+
+def ingest_upload(request, destination: Callable[[str], str], max_size: int,
+                  field: str = 'file') -> Tuple[Dict[str, str], IngestedFile]:
+    """
+    流式接收单个上传文件
+
+    必须在访问 request.form / request.files 之前调用 (请求体只能读取一次)
+
+    Args:
+        request: Flask请求
+        destination: 根据原始文件名返回保存路径的函数，文件名不合法时抛出UploadError
+        max_size: 文件大小上限 (字节)
+        field: 文件字段名
+
+    Returns:
+        Tuple[Dict, IngestedFile]: (普通表单字段, 上传文件)
+
+    Raises:
+        UploadError: 没有文件、类型不符或超过大小限制 (已写入的部分会被删除)
+    """
+    form, uploads = ingest_uploads(request, destination, max_size, fields=(field,), max_files=1, strict=True)
+    return form, uploads[0]
+
+def ingest_uploads(request, destination: Callable[[str], str], max_size: Union[int, Callable[[str], int]],
+                   fields: Iterable[str] = ('files',), max_files: int = 20,
+                   strict: bool = False) -> Tuple[Dict[str, str], List[IngestedFile]]:
+    """
+    流式接收多个上传文件
+
+    Args:
+        request: Flask请求
+        destination: 根据原始文件名返回保存路径的函数，文件名不合法时抛出UploadError
+        max_size: 单个文件的大小上限 (字节)，也可以是根据文件名返回上限的函数
+        fields: 文件字段名
+        max_files: 最多接收的文件数，超出的文件被忽略
+        strict: 为True时任一文件被拒绝即抛出UploadError并删除全部已写入的文件；
+            为False时被拒绝的文件记录在 error 属性中，其余文件照常接收
+
+    Returns:
+        Tuple[Dict, List[IngestedFile]]: (普通表单字段, 按上传顺序排列的文件)
+
+    Raises:
+        UploadError: 请求格式错误或没有任何文件
+    """
+    fields = set(fields)
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    boundary = options.get('boundary', '').encode('latin-1')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadError('未选择文件')
+
+    # Content-Length已经超过上限时无需读取请求体
+    if (isinstance(max_size, int) and request.content_length
+            and request.content_length > max_size * max_files + FORM_OVERHEAD):
+        raise UploadError(f'文件大小超过限制 ({max_size // (1024*1024)}MB)')
+
+    # 解码器缓冲区最多保存一个数据块加上未解析完的分段头
+    decoder = MultipartDecoder(boundary, max_form_memory_size=CHUNK_SIZE + FORM_OVERHEAD)
+    stream = request.stream
+    form: Dict[str, str] = {}
+    uploads: List[IngestedFile] = []
+    writer: Optional[_FileWriter] = None
+    part = None
+    buffer = []
+    form_size = 0
+
+    def reject(upload: IngestedFile, error: UploadError):
+        if strict:
+            raise error
+        upload.error = error.message
+
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, Field):
+                    part, buffer = event, []
+                elif isinstance(event, File):
+                    part = event
+                    if event.name in fields and event.filename and len(uploads) < max_files:
+                        upload = IngestedFile(event.filename, None)
+                        uploads.append(upload)
+                        try:
+                            upload.path = destination(event.filename)
+                            limit = max_size(event.filename) if callable(max_size) else max_size
+                            writer = _FileWriter(upload, limit)
+                        except UploadError as e:
+                            reject(upload, e)
+                elif isinstance(event, Data):
+                    if isinstance(part, Field):
+                        form_size += len(event.data)
+                        if form_size > FORM_OVERHEAD:
+                            raise UploadError('表单字段过大')
+                        buffer.append(event.data)
+                        if not event.more_data:
+                            form[part.name] = b''.join(buffer).decode('utf-8', 'replace')
+                    elif writer is not None:
+                        # 被拒绝的文件丢弃剩余数据，继续解析后面的分段
+                        try:
+                            writer.write(event.data)
+                            if not event.more_data:
+                                writer.finish()
+                                writer = None
+                        except UploadError as e:
+                            writer.abort()
+                            writer, current = None, uploads[-1]
+                            current.path = None
+                            reject(current, e)
+                event = decoder.next_event()
+            if not chunk or isinstance(event, Epilogue):
+                break
+        if not uploads:
+            raise UploadError('未选择文件')
+        if writer is not None:
+            raise UploadError('上传数据不完整')  # 请求体在文件数据中途结束
+    except Exception as e:
+        # 删除已写入的部分
+        if writer is not None:
+            writer.abort()
+        for upload in uploads:
+            if upload.path and os.path.exists(upload.path):
+                os.remove(upload.path)
+        if isinstance(e, UploadError):
+            raise
+        raise UploadError('上传数据格式错误')
+
+    return form, uploads
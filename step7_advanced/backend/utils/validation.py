@@ -6,8 +6,9 @@
 """
 
 import re
-from typing import Dict, List, Any, Optional, Union
-from marshmallow import Schema, fields, validate, ValidationError, post_load
+from functools import lru_cache
+from typing import Callable, Dict, List, Any, Optional, Type, Union
+from marshmallow import RAISE, Schema, fields, missing, validate, ValidationError, post_load
 from werkzeug.datastructures import FileStorage
 
 class ValidationHelper:
@@ -150,7 +151,7 @@ class ArticleCreateSchema(Schema):
     )
     tags = fields.List(
         fields.Str(validate=validate.Length(min=1, max=50)),
-        missing=[],
+        missing=list,  # 模式实例会被缓存复用，默认值每次生成新的列表
         validate=validate.Length(max=10, error='标签数量不能超过10个')
     )
     is_published = fields.Bool(missing=False)
@@ -217,7 +218,7 @@ class SearchSchema(Schema):
     """搜索参数验证模式"""
     q = fields.Str(required=True, validate=validate.Length(min=1, max=100, error='搜索关键词长度必须在1-100个字符之间'))
     category = fields.Str(missing='', validate=validate.Length(max=50))
-    sort = fields.Str(missing='created_at', validate=validate.OneOf(['created_at', 'updated_at', 'views', 'likes']))
+    sort = fields.Str(missing='relevance', validate=validate.OneOf(['relevance', 'created_at', 'updated_at', 'views', 'likes']))
     order = fields.Str(missing='desc', validate=validate.OneOf(['asc', 'desc']))
 
 # 评论验证模式
@@ -231,6 +232,11 @@ class CommentUpdateSchema(Schema):
     """评论更新验证模式"""
     content = fields.Str(required=True, validate=validate.Length(min=1, max=1000, error='评论内容长度必须在1-1000个字符之间'))
 
+class CommentThreadSchema(Schema):
+    """评论树查询参数验证模式 (上限由配置决定)"""
+    depth = fields.Int(missing=None, validate=validate.Range(min=0, error='深度不能小于0'))
+    limit = fields.Int(missing=None, validate=validate.Range(min=1, error='数量必须大于0'))
+
 # 用户验证模式
 class UserProfileUpdateSchema(Schema):
     """用户资料更新验证模式"""
@@ -245,6 +251,98 @@ class UserProfileUpdateSchema(Schema):
     )
     email = fields.Email(error_messages={'invalid': '邮箱格式不正确'})
 
+# 模式实例缓存与快速路径
+# 模式实例在加载时不保存请求相关的状态，每个模式类只创建一次；
+# 只由整数/字符串字段和 Range / Length / OneOf 校验组成的简单模式 (如 PaginationSchema、SearchSchema)
+# 预先编译成快速加载函数，合法输入直接转换，遇到任何需要报错或不常见的输入时再交给marshmallow处理，
+# 错误信息与原来完全一致
+_INVALID = object()
+
+def _to_int(value):
+    if type(value) is int:
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    return _INVALID
+
+def _to_str(value):
+    return value if isinstance(value, str) else _INVALID
+
+_FAST_CONVERTERS = {fields.Integer: _to_int, fields.String: _to_str}
+
+def _compile_check(validator) -> Optional[Callable[[Any], bool]]:
+    """把marshmallow校验器转换为判断函数，不支持的校验器返回None"""
+    if type(validator) is validate.Range:
+        low, high = validator.min, validator.max
+        low_inclusive, high_inclusive = validator.min_inclusive, validator.max_inclusive
+        return lambda value: (
+            (low is None or (value >= low if low_inclusive else value > low))
+            and (high is None or (value <= high if high_inclusive else value < high))
+        )
+    if type(validator) is validate.Length:
+        low, high, equal = validator.min, validator.max, validator.equal
+        if equal is not None:
+            return lambda value: len(value) == equal
+        return lambda value: (low is None or len(value) >= low) and (high is None or len(value) <= high)
+    if type(validator) is validate.OneOf:
+        choices = frozenset(validator.choices)
+        return lambda value: value in choices
+    return None
+
+def compile_fast_loader(schema_class: Type[Schema]) -> Optional[Callable[[Dict], Optional[Dict]]]:
+    """
+    为简单模式编译快速加载函数
+    
+    Returns:
+        Callable: 接收请求数据，合法时返回加载结果，需要marshmallow处理时返回None；
+        模式包含不支持的字段类型、校验器或钩子时返回None
+    """
+    if any(schema_class._hooks.values()) or schema_class.opts.unknown != RAISE:
+        return None
+    
+    specs = []
+    for name, field in schema_class._declared_fields.items():
+        convert = _FAST_CONVERTERS.get(type(field))
+        if convert is None or field.data_key or field.attribute or field.dump_only:
+            return None
+        if type(field) is fields.Integer and field.strict:
+            return None
+        checks = [_compile_check(validator) for validator in field.validators]
+        if None in checks:
+            return None
+        specs.append((name, convert, tuple(checks), field.required, field.load_default))
+    names = frozenset(name for name, *_ in specs)
+    
+    def load(data):
+        if type(data) is not dict or not names.issuperset(data):
+            return None
+        result = {}
+        for name, convert, checks, required, default in specs:
+            if name in data:
+                value = convert(data[name])
+                if value is _INVALID:
+                    return None
+                for check in checks:
+                    if not check(value):
+                        return None
+                result[name] = value
+            elif required:
+                return None
+            elif default is not missing:
+                result[name] = default() if callable(default) else default
+        return result
+    
+    return load
+
+@lru_cache(maxsize=None)
+def get_schema(schema_class: Type[Schema]) -> Schema:
+    """获取缓存的模式实例"""
+    return schema_class()
+
+@lru_cache(maxsize=None)
+def _get_fast_loader(schema_class: Type[Schema]):
+    return compile_fast_loader(schema_class)
+
 def validate_request_data(schema_class: Schema, data: Dict) -> Dict[str, Any]:
     """
     验证请求数据
@@ -259,9 +357,14 @@ def validate_request_data(schema_class: Schema, data: Dict) -> Dict[str, Any]:
     Raises:
         ValidationError: 验证失败时抛出
     """
-    schema = schema_class()
+    fast_loader = _get_fast_loader(schema_class)
+    if fast_loader is not None:
+        result = fast_loader(data)
+        if result is not None:
+            return result
+    
     try:
-        return schema.load(data)
+        return get_schema(schema_class).load(data)
     except ValidationError as e:
         raise ValidationError(e.messages)
 